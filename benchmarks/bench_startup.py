@@ -0,0 +1,96 @@
+"""Startup-time benchmark for the blux-system CLI.
+
+Runs each command in a fresh interpreter and compares the median wall time to
+a bare interpreter. Exits non-zero when the import overhead exceeds the budget
+or when a heavy module (such as jsonschema) leaks into the receipt path.
+
+    python benchmarks/bench_startup.py --runs 20 --budget-ms 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+FORBIDDEN_MODULES = ("jsonschema", "dataclasses", "inspect", "tempfile", "typing", "datetime")
+
+
+def _median_seconds(command: list[str], runs: int, env: dict[str, str]) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True, env=env)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="Runs per command")
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="Allowed overhead over a bare interpreter")
+    args = parser.parse_args()
+
+    env = dict(os.environ, BLUX_DETERMINISTIC_TIMESTAMP="2024-01-01T00:00:00Z")
+    with tempfile.TemporaryDirectory() as workdir:
+        snapshot_path = Path(workdir) / "snapshot.json"
+        snapshot_path.write_text(
+            json.dumps(
+                {
+                    "contract_version": "1.0",
+                    "created_at": "2024-01-01T00:00:00Z",
+                    "inputs": [],
+                    "outputs": [{"path": "result.json", "hash": "sha256:abc", "size": 1}],
+                    "output_bundles": [],
+                    "patch_bundles": [],
+                    "snapshot_hash": "sha256:snapshot",
+                }
+            ),
+            encoding="utf-8",
+        )
+        # Warm the bytecode cache so the first run does not pay for compilation.
+        subprocess.run([sys.executable, "-c", "import blux_system.cli"], check=True, env=env)
+
+        bare = _median_seconds([sys.executable, "-c", "pass"], args.runs, env)
+        imported = _median_seconds([sys.executable, "-c", "import blux_system.cli"], args.runs, env)
+        receipt = _median_seconds(
+            [sys.executable, "-m", "blux_system.cli", "receipt", "--snapshot", str(snapshot_path), "--out", workdir],
+            args.runs,
+            env,
+        )
+        probe = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, blux_system.cli; print(' '.join(m for m in sys.argv[1:] if m in sys.modules))",
+                *FORBIDDEN_MODULES,
+            ],
+            check=True,
+            capture_output=True,
+            env=env,
+            text=True,
+        )
+
+    leaked = probe.stdout.split()
+    overhead_ms = (receipt - bare) * 1000
+    print(f"bare interpreter:   {bare * 1000:7.1f} ms")
+    print(f"import cli:         {imported * 1000:7.1f} ms")
+    print(f"receipt command:    {receipt * 1000:7.1f} ms")
+    print(f"receipt overhead:   {overhead_ms:7.1f} ms (budget {args.budget_ms:.1f} ms)")
+    if leaked:
+        print(f"FAIL: heavy modules imported on the CLI path: {', '.join(leaked)}")
+        return 1
+    if overhead_ms > args.budget_ms:
+        print("FAIL: startup overhead exceeds budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
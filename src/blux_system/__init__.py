@@ -1,13 +1,8 @@
 """BLUX system state, snapshot, and receipt utilities."""
 
-from blux_system.core import (
-    build_replay_report,
-    canonical_json_bytes,
-    load_state,
-    make_receipt,
-    make_snapshot,
-    save_state,
-)
+from __future__ import annotations
+
+import importlib
 
 __all__ = [
     "build_replay_report",
@@ -19,3 +14,15 @@ __all__ = [
 ]
 
 __version__ = "1.0.0"
+
+
+def __getattr__(name: str) -> object:
+    if name in __all__:
+        value = getattr(importlib.import_module("blux_system.core"), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_left
+from collections import namedtuple
+from collections.abc import Iterator, Sequence
+from pathlib import Path, PurePosixPath
+
+from blux_system import storage
+from blux_system.core import canonical_json_bytes, compute_self_hash, load_state
+
+_MAGIC_PREFIX = b"BLUXARC"
+ARCHIVE_VERSION = 2
+ARCHIVE_MAGIC = _MAGIC_PREFIX + bytes([ARCHIVE_VERSION])
+DEFAULT_BLOCK_SIZE = 1 << 18
+
+_HASH_FIELDS = ("report_hash", "receipt_hash", "snapshot_hash")
+_HASH_PREFIX = "sha256:"
+_FOOTER = struct.Struct("<QQQQQ8s")
+_BLOCK = struct.Struct("<QII")
+_RECORD = struct.Struct("<32sBIIIQI")
+_HASH_SLOT = struct.Struct("<I")
+
+
+class ArchiveRecord(namedtuple("ArchiveRecord", ["name", "field", "hash", "block", "offset", "length"])):
+    __slots__ = ()
+
+
+def is_archive(path: str | Path) -> bool:
+    with open(path, "rb") as handle:
+        return handle.read(len(_MAGIC_PREFIX)) == _MAGIC_PREFIX
+
+
+def _digest(document_hash: str) -> bytes | None:
+    if not document_hash.startswith(_HASH_PREFIX):
+        return None
+    hex_digest = document_hash[len(_HASH_PREFIX) :]
+    try:
+        digest = bytes.fromhex(hex_digest)
+    except ValueError:
+        return None
+    if len(digest) != 32 or digest.hex() != hex_digest:
+        return None
+    return digest
+
+
+def _archive_names(paths: Sequence[Path], base: Path | None) -> list[str]:
+    resolved = [path.resolve() for path in paths]
+    if base is None:
+        base = Path(os.path.commonpath([path.parent for path in resolved]))
+    else:
+        base = base.resolve()
+    names = [path.relative_to(base).as_posix() for path in resolved]
+    seen: set[str] = set()
+    for path, name in zip(paths, names):
+        if name in seen:
+            raise ValueError(f"{path} would be archived twice as {name}")
+        seen.add(name)
+    return names
+
+
+def _document_bytes(path: Path) -> tuple[str, str, bytes]:
+    document = load_state(path)
+    self_hash = compute_self_hash(document)
+    if self_hash is None:
+        raise ValueError(f"{path} has no report_hash, receipt_hash or snapshot_hash")
+    field, calculated = self_hash
+    if document[field] != calculated:
+        raise ValueError(f"{path} failed {field} verification")
+    return field, calculated, canonical_json_bytes(document)
+
+
+def pack_archive(
+    paths: Sequence[Path],
+    destination: Path,
+    *,
+    base: Path | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    level: int = 9,
+    fsync: str = "none",
+) -> list[ArchiveRecord]:
+    paths = [Path(path) for path in paths]
+    if not paths:
+        raise ValueError("no documents to archive")
+    names = _archive_names(paths, base)
+    records: list[ArchiveRecord] = []
+    digests: list[bytes] = []
+    blocks: list[tuple[int, int, int]] = []
+    with storage.open_atomic(destination, fsync=fsync, compression=None) as handle:
+        handle.write(ARCHIVE_MAGIC)
+        position = len(ARCHIVE_MAGIC)
+        pending: list[bytes] = []
+        pending_size = 0
+        first_record = 0
+
+        def flush_block() -> None:
+            nonlocal position, pending_size, first_record
+            compressed = zlib.compress(b"".join(pending), level)
+            handle.write(compressed)
+            blocks.append((position, len(compressed), first_record))
+            first_record = len(records)
+            position += len(compressed)
+            pending.clear()
+            pending_size = 0
+
+        for path, name in zip(paths, names):
+            field, calculated, data = _document_bytes(path)
+            digest = _digest(calculated)
+            if digest is None:
+                raise ValueError(f"{path} has an unsupported {field} {calculated!r}")
+            records.append(ArchiveRecord(name, field, calculated, len(blocks), pending_size, len(data)))
+            digests.append(digest)
+            pending.append(data)
+            pending_size += len(data)
+            if pending_size >= block_size:
+                flush_block()
+        if pending:
+            flush_block()
+
+        names_offset = position
+        name_offsets = []
+        name_position = 0
+        for record in records:
+            encoded = record.name.encode("utf-8")
+            handle.write(encoded)
+            name_offsets.append((name_position, len(encoded)))
+            name_position += len(encoded)
+        blocks_offset = names_offset + name_position
+        for block in blocks:
+            handle.write(_BLOCK.pack(*block))
+        records_offset = blocks_offset + len(blocks) * _BLOCK.size
+        for record, digest, (name_offset, name_length) in zip(records, digests, name_offsets):
+            handle.write(
+                _RECORD.pack(
+                    digest,
+                    _HASH_FIELDS.index(record.field),
+                    record.block,
+                    record.offset,
+                    record.length,
+                    name_offset,
+                    name_length,
+                )
+            )
+        for ordinal in sorted(range(len(records)), key=digests.__getitem__):
+            handle.write(_HASH_SLOT.pack(ordinal))
+        handle.write(
+            _FOOTER.pack(names_offset, blocks_offset, len(blocks), records_offset, len(records), ARCHIVE_MAGIC)
+        )
+    return records
+
+
+class _DigestColumn:
+    def __init__(self, reader: ArchiveReader) -> None:
+        self._reader = reader
+
+    def __len__(self) -> int:
+        return len(self._reader)
+
+    def __getitem__(self, position: int) -> bytes:
+        return self._reader._digest_at(self._reader._ordinal_at(position))
+
+
+class ArchiveReader:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as handle:
+            try:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise ValueError(f"{self.path} is not a receipt archive") from exc
+        try:
+            self._read_index()
+        except BaseException:
+            self._map.close()
+            raise
+        self._block_index: int | None = None
+        self._block = b""
+
+    def _read_index(self) -> None:
+        data = self._map
+        if data[: len(_MAGIC_PREFIX)] != _MAGIC_PREFIX:
+            raise ValueError(f"{self.path} is not a receipt archive")
+        if data[: len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            raise ValueError(f"unsupported archive version {data[len(_MAGIC_PREFIX)]} in {self.path}")
+        footer_offset = len(data) - _FOOTER.size
+        if footer_offset < len(ARCHIVE_MAGIC):
+            raise ValueError(f"{self.path} is truncated")
+        names_offset, blocks_offset, block_count, records_offset, record_count, magic = _FOOTER.unpack_from(
+            data, footer_offset
+        )
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f"{self.path} is truncated")
+        self._hash_index_offset = records_offset + record_count * _RECORD.size
+        if not (
+            len(ARCHIVE_MAGIC) <= names_offset <= blocks_offset
+            and blocks_offset + block_count * _BLOCK.size == records_offset
+            and self._hash_index_offset + record_count * _HASH_SLOT.size == footer_offset
+        ):
+            raise ValueError(f"{self.path} has a corrupt index")
+        self._names_offset = names_offset
+        self._blocks_offset = blocks_offset
+        self._block_count = block_count
+        self._records_offset = records_offset
+        self._record_count = record_count
+
+    def _corrupt(self, what: str) -> ValueError:
+        return ValueError(f"{what} of {self.path} is corrupt")
+
+    def _ordinal_at(self, position: int) -> int:
+        (ordinal,) = _HASH_SLOT.unpack_from(self._map, self._hash_index_offset + position * _HASH_SLOT.size)
+        if ordinal >= self._record_count:
+            raise self._corrupt(f"hash index entry {position}")
+        return ordinal
+
+    def _digest_at(self, ordinal: int) -> bytes:
+        start = self._records_offset + ordinal * _RECORD.size
+        return self._map[start : start + 32]
+
+    def record(self, ordinal: int) -> ArchiveRecord:
+        if not 0 <= ordinal < self._record_count:
+            raise IndexError(ordinal)
+        digest, code, block, offset, length, name_offset, name_length = _RECORD.unpack_from(
+            self._map, self._records_offset + ordinal * _RECORD.size
+        )
+        name_start = self._names_offset + name_offset
+        if code >= len(_HASH_FIELDS) or block >= self._block_count or name_start + name_length > self._blocks_offset:
+            raise self._corrupt(f"record {ordinal}")
+        name = self._map[name_start : name_start + name_length].decode("utf-8")
+        return ArchiveRecord(name, _HASH_FIELDS[code], _HASH_PREFIX + digest.hex(), block, offset, length)
+
+    @property
+    def block_count(self) -> int:
+        return self._block_count
+
+    def _first_record(self, block_index: int) -> int:
+        if block_index >= self._block_count:
+            return self._record_count
+        _, _, first_record = _BLOCK.unpack_from(self._map, self._blocks_offset + block_index * _BLOCK.size)
+        return first_record
+
+    def block_records(self, start: int, stop: int) -> range:
+        first, last = self._first_record(start), self._first_record(stop)
+        if not first <= last <= self._record_count:
+            raise self._corrupt(f"block table entries {start}-{stop}")
+        return range(first, last)
+
+    @property
+    def records(self) -> list[ArchiveRecord]:
+        return [self.record(ordinal) for ordinal in range(self._record_count)]
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> ArchiveReader:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def find(self, document_hash: str) -> list[ArchiveRecord]:
+        digest = _digest(document_hash)
+        if digest is None:
+            return []
+        matches = []
+        for position in range(bisect_left(_DigestColumn(self), digest), self._record_count):
+            ordinal = self._ordinal_at(position)
+            if self._digest_at(ordinal) != digest:
+                break
+            matches.append(self.record(ordinal))
+        return matches
+
+    def _load_block(self, block_index: int) -> bytes:
+        if block_index != self._block_index:
+            offset, length, _ = _BLOCK.unpack_from(self._map, self._blocks_offset + block_index * _BLOCK.size)
+            if offset < len(ARCHIVE_MAGIC) or offset + length > self._names_offset:
+                raise self._corrupt(f"block {block_index}")
+            try:
+                self._block = zlib.decompress(self._map[offset : offset + length])
+            except zlib.error as exc:
+                raise ValueError(f"block {block_index} of {self.path} is corrupt: {exc}") from exc
+            self._block_index = block_index
+        return self._block
+
+    def read_raw(self, record: ArchiveRecord) -> bytes:
+        block = self._load_block(record.block)
+        return block[record.offset : record.offset + record.length]
+
+    def read(self, record: ArchiveRecord) -> bytes:
+        data = self.read_raw(record)
+        document = json.loads(data.decode("utf-8"))
+        if compute_self_hash(document) != (record.field, record.hash) or document[record.field] != record.hash:
+            raise ValueError(f"{record.name} in {self.path} failed {record.field} verification")
+        return data
+
+    def __iter__(self) -> Iterator[tuple[ArchiveRecord, bytes]]:
+        for ordinal in range(self._record_count):
+            record = self.record(ordinal)
+            yield record, self.read(record)
+
+
+def _safe_destination(output_dir: Path, name: str) -> Path:
+    relative = PurePosixPath(name)
+    if relative.is_absolute() or ".." in relative.parts or not relative.parts:
+        raise ValueError(f"refusing to extract {name!r} outside the output directory")
+    return output_dir.joinpath(*relative.parts)
+
+
+def unpack_archive(archive_path: Path, output_dir: Path, *, fsync: str = "none") -> list[Path]:
+    written = []
+    with ArchiveReader(archive_path) as reader:
+        for record, data in reader:
+            destination = _safe_destination(output_dir, record.name)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            storage.write_bytes(destination, data, fsync=fsync)
+            written.append(destination)
+    return written
+
+
+def query_archive(archive_path: Path, document_hash: str) -> list[tuple[ArchiveRecord, bytes]]:
+    with ArchiveReader(archive_path) as reader:
+        return [(record, reader.read(record)) for record in reader.find(document_hash)]
@@ -1,26 +1,64 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import os
+import sys
+from collections.abc import Sequence
 from pathlib import Path
 
+from blux_system import storage
 from blux_system.core import (
-    build_receipt_from_snapshot,
     build_replay_report,
-    build_snapshot_from_dirs,
+    build_replay_partition,
     canonical_json_bytes,
+    combine_replay_partitions,
+    load_state,
+    make_receipts,
+    make_snapshot_shard,
+    merge_snapshot_shards,
+    write_receipt_from_snapshot,
+    write_snapshot_from_dirs,
 )
 
 
-def _write_json(path: Path, payload: dict[str, object]) -> None:
-    path.write_bytes(canonical_json_bytes(payload))
+def _write_json(path: Path, payload: dict[str, object], fsync: str) -> None:
+    storage.write_bytes(path, canonical_json_bytes(payload), fsync=fsync)
+
+
+def _parse_part(value: str) -> tuple[int, int]:
+    index, sep, count = value.partition("/")
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        shard = None
+    if not sep or shard is None or shard[1] < 1 or not 0 <= shard[0] < shard[1]:
+        raise argparse.ArgumentTypeError(f"expected I/N with 0 <= I < N, got {value!r}")
+    return shard
 
 
 def snapshot_command(args: argparse.Namespace) -> int:
     input_dir = Path(args.input_dir)
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    snapshot = build_snapshot_from_dirs(input_dir, output_dir)
-    _write_json(output_dir / "snapshot.json", snapshot)
+    if args.shard is not None:
+        shard_index, shard_count = args.shard
+        shard = make_snapshot_shard(input_dir, output_dir, shard_index, shard_count, run_id=args.run_id)
+        _write_json(Path(args.shard_out), shard, args.fsync)
+        return 0
+    bundle_spec = load_state(args.bundles) if args.bundles else None
+    write_snapshot_from_dirs(
+        input_dir, output_dir, output_dir / "snapshot.json", bundle_spec=bundle_spec, fsync=args.fsync
+    )
+    return 0
+
+
+def merge_command(args: argparse.Namespace) -> int:
+    shards = [load_state(path) for path in args.shards]
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    snapshot = merge_snapshot_shards(shards)
+    _write_json(output_dir / "snapshot.json", snapshot, args.fsync)
     return 0
 
 
@@ -28,45 +66,238 @@ def receipt_command(args: argparse.Namespace) -> int:
     snapshot_path = Path(args.snapshot)
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    receipt = build_receipt_from_snapshot(snapshot_path)
-    _write_json(output_dir / "receipt.json", receipt)
+    write_receipt_from_snapshot(snapshot_path, output_dir / "receipt.json", fsync=args.fsync)
     return 0
 
 
+def _expand_pattern(value: str) -> list[Path]:
+    if not any(char in value for char in "*?[") or Path(value).exists():
+        return [Path(value)]
+    matches = sorted(match for match in glob.glob(value, recursive=True) if os.path.isfile(match))
+    if not matches:
+        raise argparse.ArgumentTypeError(f"no files match {value!r}")
+    return [Path(match) for match in matches]
+
+
+def _expand_paths(values: Sequence[list[Path]]) -> list[Path]:
+    return [path for paths in values for path in paths]
+
+
+def receipt_batch_command(args: argparse.Namespace) -> int:
+    snapshot_paths = _expand_paths(args.snapshots)
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    results = make_receipts(snapshot_paths, output_dir=output_dir, workers=args.workers, fsync=args.fsync)
+    failed = [result for result in results if result["error"] is not None]
+    for result in failed:
+        print(f"{result['snapshot']}: {result['error']}", file=sys.stderr)
+    print(f"{len(results) - len(failed)}/{len(results)} receipts written, {len(failed)} failed")
+    return 1 if failed else 0
+
+
 def replay_command(args: argparse.Namespace) -> int:
     receipt_path = Path(args.receipt)
     root_dir = Path(args.root)
     root_dir.mkdir(parents=True, exist_ok=True)
-    report = build_replay_report(receipt_path, root_dir)
-    _write_json(root_dir / "replay_report.json", report)
+    if args.partition is not None:
+        partition_index, partition_count = args.partition
+        partition = build_replay_partition(receipt_path, root_dir, partition_index, partition_count)
+        _write_json(Path(args.partition_out), partition, args.fsync)
+        return 0
+    cache_dir = Path(args.cache) if args.cache else None
+    report = build_replay_report(receipt_path, root_dir, cache_dir=cache_dir, refresh=args.refresh)
+    _write_json(root_dir / "replay_report.json", report, args.fsync)
+    return 0
+
+
+def pack_command(args: argparse.Namespace) -> int:
+    from blux_system.archive import pack_archive
+
+    paths = _expand_paths(args.files)
+    base = Path(args.base) if args.base else None
+    pack_archive(paths, Path(args.archive), base=base, fsync=args.fsync)
+    return 0
+
+
+def unpack_command(args: argparse.Namespace) -> int:
+    from blux_system.archive import unpack_archive
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    unpack_archive(Path(args.archive), output_dir, fsync=args.fsync)
     return 0
 
 
-def build_parser() -> argparse.ArgumentParser:
+def query_command(args: argparse.Namespace) -> int:
+    from blux_system.archive import query_archive
+
+    matches = query_archive(Path(args.archive), args.hash)
+    if not matches:
+        print(f"no document with hash {args.hash}", file=sys.stderr)
+        return 1
+    _, data = matches[0]
+    if args.out:
+        storage.write_bytes(Path(args.out), data, fsync=args.fsync)
+    else:
+        sys.stdout.buffer.write(data + b"\n")
+    return 0
+
+
+def verify_hashes_command(args: argparse.Namespace) -> int:
+    from blux_system.verify import verify_document_hashes
+
+    report = verify_document_hashes(_expand_paths(args.files), workers=args.workers)
+    if args.out:
+        _write_json(Path(args.out), report, args.fsync)
+    summary = report["summary"]
+    throughput = report["throughput"]
+    print(
+        f"{summary['verified']}/{summary['total_documents']} documents verified, "
+        f"{summary['hash_mismatches']} hash mismatches, {summary['errors']} errors "
+        f"({throughput['documents_per_second']} docs/sec, {throughput['workers']} workers)"
+    )
+    return 0 if summary["ok"] else 1
+
+
+def replay_combine_command(args: argparse.Namespace) -> int:
+    partitions = [load_state(path) for path in args.partitions]
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report = combine_replay_partitions(partitions)
+    _write_json(output_dir / "replay_report.json", report, args.fsync)
+    return 0
+
+
+COMMANDS = (
+    "snapshot",
+    "merge",
+    "receipt",
+    "receipt-batch",
+    "replay",
+    "replay-combine",
+    "pack",
+    "unpack",
+    "query",
+    "verify-hashes",
+)
+
+
+def build_parser(command: str | None = None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="blux-system", description="BLUX deterministic snapshots and receipts")
     subparsers = parser.add_subparsers(dest="command", required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--fsync",
+        choices=storage.FSYNC_POLICIES,
+        default="none",
+        help="Durability of written files: none, file (fsync data) or dir (fsync data and directory)",
+    )
+
+    if command in (None, "snapshot"):
+        snapshot_parser = subparsers.add_parser("snapshot", parents=[common], help="Record deterministic snapshot data")
+        snapshot_parser.add_argument("--in", dest="input_dir", required=True, help="Input directory")
+        snapshot_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
+        snapshot_parser.add_argument("--bundles", help="Bundle spec file (JSON)")
+        snapshot_parser.add_argument("--shard", type=_parse_part, help="Record only shard I of N (I/N)")
+        snapshot_parser.add_argument("--shard-out", help="Partial snapshot file (required with --shard)")
+        snapshot_parser.add_argument("--run-id", help="Capture identifier shared by every shard of one run")
+        snapshot_parser.set_defaults(func=snapshot_command)
+
+    if command in (None, "merge"):
+        merge_parser = subparsers.add_parser("merge", parents=[common], help="Merge partial snapshot shards")
+        merge_parser.add_argument("--shards", nargs="+", required=True, help="Partial snapshot files")
+        merge_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
+        merge_parser.set_defaults(func=merge_command)
+
+    if command in (None, "receipt"):
+        receipt_parser = subparsers.add_parser("receipt", parents=[common], help="Record deterministic receipt data")
+        receipt_parser.add_argument("--snapshot", required=True, help="Snapshot file")
+        receipt_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
+        receipt_parser.set_defaults(func=receipt_command)
+
+    if command in (None, "receipt-batch"):
+        batch_parser = subparsers.add_parser(
+            "receipt-batch", parents=[common], help="Record receipts for many snapshots"
+        )
+        batch_parser.add_argument(
+            "--snapshots", nargs="+", type=_expand_pattern, required=True, help="Snapshot files or glob patterns"
+        )
+        batch_parser.add_argument("--out", dest="output_dir", help="Output tree (default: next to each snapshot)")
+        batch_parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+        batch_parser.set_defaults(func=receipt_batch_command)
+
+    if command in (None, "replay"):
+        replay_parser = subparsers.add_parser("replay", parents=[common], help="Replay and verify receipt data")
+        replay_parser.add_argument("--receipt", required=True, help="Receipt file")
+        replay_parser.add_argument("--root", required=True, help="Root directory for outputs")
+        replay_parser.add_argument("--cache", help="Replay cache directory")
+        replay_parser.add_argument("--refresh", action="store_true", help="Re-verify and refresh the cached report")
+        replay_parser.add_argument("--partition", type=_parse_part, help="Verify only partition I of N (I/N)")
+        replay_parser.add_argument("--partition-out", help="Partial report file (required with --partition)")
+        replay_parser.set_defaults(func=replay_command)
+
+    if command in (None, "replay-combine"):
+        combine_parser = subparsers.add_parser(
+            "replay-combine", parents=[common], help="Combine partial replay reports"
+        )
+        combine_parser.add_argument("--partitions", nargs="+", required=True, help="Partial report files")
+        combine_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
+        combine_parser.set_defaults(func=replay_combine_command)
+
+    if command in (None, "pack"):
+        pack_parser = subparsers.add_parser("pack", parents=[common], help="Pack receipts and reports into an archive")
+        pack_parser.add_argument("--out", dest="archive", required=True, help="Archive file")
+        pack_parser.add_argument(
+            "--files", nargs="+", type=_expand_pattern, required=True, help="Document files or glob patterns"
+        )
+        pack_parser.add_argument("--base", help="Directory names are stored relative to (default: common parent)")
+        pack_parser.set_defaults(func=pack_command)
 
-    snapshot_parser = subparsers.add_parser("snapshot", help="Record deterministic snapshot data")
-    snapshot_parser.add_argument("--in", dest="input_dir", required=True, help="Input directory")
-    snapshot_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
-    snapshot_parser.set_defaults(func=snapshot_command)
+    if command in (None, "unpack"):
+        unpack_parser = subparsers.add_parser("unpack", parents=[common], help="Extract and verify an archive")
+        unpack_parser.add_argument("--archive", required=True, help="Archive file")
+        unpack_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
+        unpack_parser.set_defaults(func=unpack_command)
 
-    receipt_parser = subparsers.add_parser("receipt", help="Record deterministic receipt data")
-    receipt_parser.add_argument("--snapshot", required=True, help="Snapshot file")
-    receipt_parser.add_argument("--out", dest="output_dir", required=True, help="Output directory")
-    receipt_parser.set_defaults(func=receipt_command)
+    if command in (None, "query"):
+        query_parser = subparsers.add_parser("query", parents=[common], help="Extract one document by its hash")
+        query_parser.add_argument("--archive", required=True, help="Archive file")
+        query_parser.add_argument("--hash", required=True, help="receipt_hash, snapshot_hash or report_hash")
+        query_parser.add_argument("--out", help="Output file (default: stdout)")
+        query_parser.set_defaults(func=query_command)
 
-    replay_parser = subparsers.add_parser("replay", help="Replay and verify receipt data")
-    replay_parser.add_argument("--receipt", required=True, help="Receipt file")
-    replay_parser.add_argument("--root", required=True, help="Root directory for outputs")
-    replay_parser.set_defaults(func=replay_command)
+    if command in (None, "verify-hashes"):
+        verify_parser = subparsers.add_parser(
+            "verify-hashes", parents=[common], help="Check the self-hashes of many documents"
+        )
+        verify_parser.add_argument(
+            "--files",
+            nargs="+",
+            type=_expand_pattern,
+            required=True,
+            help="Receipts, snapshots, reports, archives or glob patterns",
+        )
+        verify_parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+        verify_parser.add_argument("--out", help="Verification report file")
+        verify_parser.set_defaults(func=verify_hashes_command)
 
     return parser
 
 
-def main() -> int:
-    parser = build_parser()
-    args = parser.parse_args()
+def main(argv: Sequence[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    command = argv[0] if argv and argv[0] in COMMANDS else None
+    parser = build_parser(command)
+    args = parser.parse_args(argv)
+    if args.command == "snapshot" and (args.shard is None) != (args.shard_out is None):
+        parser.error("--shard and --shard-out must be used together")
+    if args.command == "snapshot" and args.shard is not None and args.bundles:
+        parser.error("--bundles cannot be combined with --shard")
+    if args.command == "snapshot" and args.shard is None and args.run_id:
+        parser.error("--run-id requires --shard")
+    if args.command == "replay" and (args.partition is None) != (args.partition_out is None):
+        parser.error("--partition and --partition-out must be used together")
+    if args.command == "replay" and args.partition is not None and args.cache:
+        parser.error("--cache cannot be combined with --partition")
     return args.func(args)
 
 
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import codecs
+import fnmatch
+import functools
 import hashlib
+import heapq
+import itertools
 import json
 import os
-from dataclasses import dataclass
-from datetime import datetime, timezone
+import time
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from io import BufferedIOBase
 from pathlib import Path
-from typing import Iterable, Sequence
+
+from blux_system import storage
 
 CONTRACT_VERSION = "1.0"
 DEFAULT_ORDERING = {
@@ -18,16 +26,205 @@ DEFAULT_ORDERING = {
 }
 
 
-@dataclass(frozen=True)
+_SHA256_PREFIX = "sha256:"
+_DIGEST_SIZE = 32
+_EMPTY_DIGEST = bytes(_DIGEST_SIZE)
+
+
 class FileRecord:
-    path: str
-    hash: str
-    size: int
+    __slots__ = ("path", "hash", "size")
+    __match_args__ = ("path", "hash", "size")
+
+    def __init__(self, path: str, hash: str, size: int) -> None:
+        object.__setattr__(self, "path", path)
+        object.__setattr__(self, "hash", hash)
+        object.__setattr__(self, "size", size)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"cannot delete field {name!r}")
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.path, self.hash, self.size) == (other.path, other.hash, other.size)
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.hash, self.size))
+
+    def __reduce__(self) -> tuple[type[FileRecord], tuple[str, str, int]]:
+        return (FileRecord, (self.path, self.hash, self.size))
+
+    def __repr__(self) -> str:
+        return f"FileRecord(path={self.path!r}, hash={self.hash!r}, size={self.size!r})"
+
+    def as_dict(self) -> dict[str, object]:
+        return {"path": self.path, "hash": self.hash, "size": self.size}
+
+
+class FileRecordView:
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: FileRecordTable, index: int) -> None:
+        self._table = table
+        self._index = index
+
+    @property
+    def path(self) -> str:
+        return self._table._paths[self._index]
+
+    @property
+    def hash(self) -> str:
+        return self._table._hash_at(self._index)
+
+    @property
+    def size(self) -> object:
+        return self._table._size_at(self._index)
 
     def as_dict(self) -> dict[str, object]:
         return {"path": self.path, "hash": self.hash, "size": self.size}
 
 
+class FileRecordTable:
+    __slots__ = ("_paths", "_digests", "_sizes", "_raw_hashes", "_raw_sizes")
+
+    def __init__(self) -> None:
+        self._paths: list[str] = []
+        self._digests = bytearray()
+        self._sizes = array("q")
+        self._raw_hashes: dict[int, str] = {}
+        self._raw_sizes: dict[int, object] = {}
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[FileRecord | FileRecordView | dict[str, object]],
+    ) -> FileRecordTable:
+        table = cls()
+        table.extend(records)
+        return table
+
+    def append(self, path: str, hash: str, size: object) -> None:
+        index = len(self._paths)
+        self._paths.append(path)
+        digest = _pack_digest(hash)
+        if digest is None:
+            self._raw_hashes[index] = hash
+            digest = _EMPTY_DIGEST
+        self._digests += digest
+        if type(size) is int and -(2**63) <= size < 2**63:
+            self._sizes.append(size)
+        else:
+            self._raw_sizes[index] = size
+            self._sizes.append(0)
+
+    def extend(self, records: Iterable[FileRecord | FileRecordView | dict[str, object]]) -> None:
+        for record in records:
+            if isinstance(record, dict):
+                self.append(record["path"], record["hash"], record.get("size", 0))
+            else:
+                self.append(record.path, record.hash, record.size)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, index: int) -> FileRecordView:
+        if index < 0:
+            index += len(self._paths)
+        if not 0 <= index < len(self._paths):
+            raise IndexError("file record index out of range")
+        return FileRecordView(self, index)
+
+    def __iter__(self) -> Iterator[FileRecordView]:
+        for index in range(len(self._paths)):
+            yield FileRecordView(self, index)
+
+    def _hash_at(self, index: int) -> str:
+        raw = self._raw_hashes.get(index)
+        if raw is not None:
+            return raw
+        offset = index * _DIGEST_SIZE
+        return _SHA256_PREFIX + self._digests[offset : offset + _DIGEST_SIZE].hex()
+
+    def _size_at(self, index: int) -> object:
+        if index in self._raw_sizes:
+            return self._raw_sizes[index]
+        return self._sizes[index]
+
+    def _order(self, by_hash: bool) -> list[int] | None:
+        paths = self._paths
+        if not by_hash and all(left <= right for left, right in zip(paths, itertools.islice(paths, 1, None))):
+            return None
+        if by_hash:
+            order = sorted(range(len(paths)), key=lambda index: (paths[index], self._hash_at(index)))
+        else:
+            order = sorted(range(len(paths)), key=paths.__getitem__)
+        if all(position == index for position, index in enumerate(order)):
+            return None
+        return order
+
+    def _reordered(self, order: list[int]) -> FileRecordTable:
+        table = FileRecordTable()
+        digests = self._digests
+        table._paths = [self._paths[index] for index in order]
+        table._digests = bytearray().join(
+            digests[index * _DIGEST_SIZE : (index + 1) * _DIGEST_SIZE] for index in order
+        )
+        table._sizes = array("q", (self._sizes[index] for index in order))
+        if self._raw_hashes or self._raw_sizes:
+            position_of = {index: position for position, index in enumerate(order)}
+            table._raw_hashes = {position_of[index]: value for index, value in self._raw_hashes.items()}
+            table._raw_sizes = {position_of[index]: value for index, value in self._raw_sizes.items()}
+        return table
+
+    def sort(self, *, by_hash: bool = False) -> None:
+        order = self._order(by_hash)
+        if order is not None:
+            table = self._reordered(order)
+            for slot in FileRecordTable.__slots__:
+                setattr(self, slot, getattr(table, slot))
+
+    def sorted(self, *, by_hash: bool = False) -> FileRecordTable:
+        order = self._order(by_hash)
+        return self if order is None else self._reordered(order)
+
+    def as_dicts(self) -> Iterator[dict[str, object]]:
+        for index, path in enumerate(self._paths):
+            yield {"path": path, "hash": self._hash_at(index), "size": self._size_at(index)}
+
+    def iter_canonical_json(self) -> Iterator[bytes]:
+        yield b"["
+        for index, path in enumerate(self._paths):
+            prefix = b"," if index else b""
+            if index in self._raw_hashes or index in self._raw_sizes:
+                yield prefix + canonical_json_bytes(
+                    {"path": path, "hash": self._hash_at(index), "size": self._size_at(index)}
+                )
+            else:
+                yield prefix + b'{"hash":"%s","path":%s,"size":%d}' % (
+                    self._hash_at(index).encode("ascii"),
+                    canonical_json_bytes(path),
+                    self._sizes[index],
+                )
+        yield b"]"
+
+    def canonical_json_bytes(self) -> bytes:
+        return b"".join(self.iter_canonical_json())
+
+
+def _pack_digest(value: str) -> bytes | None:
+    if len(value) != len(_SHA256_PREFIX) + 2 * _DIGEST_SIZE or not value.startswith(_SHA256_PREFIX):
+        return None
+    hex_digest = value[len(_SHA256_PREFIX) :]
+    try:
+        digest = bytes.fromhex(hex_digest)
+    except ValueError:
+        return None
+    return digest if digest.hex() == hex_digest else None
+
+
 def canonical_json_bytes(data: object) -> bytes:
     return json.dumps(
         data,
@@ -42,47 +239,135 @@ def _hash_bytes(data: bytes) -> str:
     return f"sha256:{digest}"
 
 
-def _hash_file(path: Path) -> str:
+def _hash_file(path: str | Path) -> str:
     hasher = hashlib.sha256()
-    with path.open("rb") as handle:
+    with open(path, "rb") as handle:
         for chunk in iter(lambda: handle.read(8192), b""):
             hasher.update(chunk)
     return f"sha256:{hasher.hexdigest()}"
 
 
+class _DigestMemo:
+    def __init__(self, *, shared_only: bool = False) -> None:
+        self._shared_only = shared_only
+        self._by_path: dict[str, str] = {}
+        self._by_identity: dict[tuple[int, int] | str, str] = {}
+        self.files_hashed = 0
+        self.reads_saved = 0
+
+    def hash_file(self, path: str | Path, stat: os.stat_result | None = None) -> str:
+        key = None
+        if not self._shared_only:
+            key = str(path)
+            digest = self._by_path.get(key)
+            if digest is not None:
+                self.reads_saved += 1
+                return digest
+        if stat is None:
+            stat = os.stat(path)
+        if self._shared_only and stat.st_nlink <= 1:
+            self.files_hashed += 1
+            return _hash_file(path)
+        identity = (stat.st_dev, stat.st_ino) if stat.st_ino else os.path.realpath(path)
+        digest = self._by_identity.get(identity)
+        if digest is None:
+            digest = _hash_file(path)
+            self._by_identity[identity] = digest
+            self.files_hashed += 1
+        else:
+            self.reads_saved += 1
+        if key is not None:
+            self._by_path[key] = digest
+        return digest
+
+    def stats(self) -> dict[str, int]:
+        return {"files_hashed": self.files_hashed, "reads_saved": self.reads_saved}
+
+
 def _deterministic_timestamp() -> str:
     override = os.getenv("BLUX_DETERMINISTIC_TIMESTAMP")
     if override:
         return override
+    from datetime import datetime, timezone
+
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def _sorted_file_records(paths: Iterable[Path], base: Path) -> list[FileRecord]:
-    records = []
-    for path in paths:
-        relative = path.relative_to(base).as_posix()
-        records.append(
-            FileRecord(
-                path=relative,
-                hash=_hash_file(path),
-                size=path.stat().st_size,
+def _sorted_entries(directory: str, prefix: str) -> list[tuple[str, os.DirEntry]]:
+    try:
+        with os.scandir(directory) as entries:
+            return sorted(
+                (prefix + entry.name + ("/" if entry.is_dir(follow_symlinks=False) else ""), entry)
+                for entry in entries
             )
-        )
-    return sorted(records, key=lambda record: record.path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
+
+
+def _iter_entry_files(entries: list[tuple[str, os.DirEntry]]) -> Iterator[tuple[str, str]]:
+    stack = [iter(entries)]
+    while stack:
+        for relative, entry in stack[-1]:
+            if relative.endswith("/"):
+                stack.append(iter(_sorted_entries(entry.path, relative)))
+                break
+            if entry.is_file():
+                yield relative, entry.path
+        else:
+            stack.pop()
+
 
+def _sorted_file_records(
+    files: Iterable[tuple[str, str]],
+    memo: _DigestMemo | None = None,
+) -> FileRecordTable:
+    table = FileRecordTable()
+    for relative, path in files:
+        stat = os.stat(path)
+        digest = memo.hash_file(path, stat) if memo is not None else _hash_file(path)
+        table.append(relative, digest, stat.st_size)
+    table.sort()
+    return table
 
-def _collect_files(root: Path) -> list[FileRecord]:
+
+def _collect_files(root: Path, memo: _DigestMemo | None = None) -> FileRecordTable:
     root = root.resolve()
     if root.is_file():
-        return _sorted_file_records([root], root.parent)
-    paths = sorted(p for p in root.rglob("*") if p.is_file())
-    return _sorted_file_records(paths, root)
+        return _sorted_file_records([(root.name, str(root))], memo)
+    return _sorted_file_records(_iter_entry_files(_sorted_entries(str(root), "")), memo)
+
+
+def _shard_index(relative: str, shard_count: int) -> int:
+    prefix = relative.split("/", 1)[0]
+    digest = hashlib.sha256(prefix.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def _collect_shard_files(root: Path, shard_index: int, shard_count: int) -> FileRecordTable:
+    root = root.resolve()
+    if root.is_file():
+        if _shard_index(root.name, shard_count) != shard_index:
+            return FileRecordTable()
+        return _sorted_file_records([(root.name, str(root))])
+    owned = [
+        (relative, entry)
+        for relative, entry in _sorted_entries(str(root), "")
+        if _shard_index(entry.name, shard_count) == shard_index
+    ]
+    return _sorted_file_records(_iter_entry_files(owned))
+
+
+FileRecords = (
+    FileRecordTable | Sequence[FileRecord] | Sequence[FileRecordView] | Sequence[dict[str, object]]
+)
 
 
-def _normalize_file_records(records: Sequence[FileRecord] | Sequence[dict[str, object]]) -> list[dict[str, object]]:
+def _normalize_file_records(records: FileRecords) -> list[dict[str, object]]:
+    if isinstance(records, FileRecordTable):
+        return list(records.sorted().as_dicts())
     normalized = []
     for record in records:
-        if isinstance(record, FileRecord):
+        if isinstance(record, (FileRecord, FileRecordView)):
             normalized.append(record.as_dict())
         else:
             normalized.append(
@@ -95,53 +380,148 @@ def _normalize_file_records(records: Sequence[FileRecord] | Sequence[dict[str, o
     return sorted(normalized, key=lambda item: item["path"])
 
 
-def _normalize_output_bundles(bundles: Sequence[dict[str, object]]) -> list[dict[str, object]]:
+def _file_record_table(records: FileRecords) -> FileRecordTable:
+    if isinstance(records, FileRecordTable):
+        return records.sorted()
+    table = FileRecordTable.from_records(records)
+    table.sort()
+    return table
+
+
+def _normalize_output_bundles(
+    bundles: Sequence[dict[str, object]],
+    normalize: Callable[[FileRecords], object] = _normalize_file_records,
+) -> list[dict[str, object]]:
     normalized = []
     for bundle in bundles:
         normalized.append(
             {
                 "bundle_id": bundle["bundle_id"],
-                "files": _normalize_file_records(bundle.get("files", [])),
+                "files": normalize(bundle.get("files", [])),
             }
         )
     return sorted(normalized, key=lambda item: item["bundle_id"])
 
 
-def _normalize_patch_bundles(bundles: Sequence[dict[str, object]]) -> list[dict[str, object]]:
+def _normalize_patch_bundles(
+    bundles: Sequence[dict[str, object]],
+    normalize: Callable[[FileRecords], object] = _normalize_file_records,
+) -> list[dict[str, object]]:
     normalized = []
     for bundle in bundles:
         normalized.append(
             {
                 "bundle_id": bundle["bundle_id"],
                 "base_path": bundle["base_path"],
-                "patches": _normalize_file_records(bundle.get("patches", [])),
-                "outputs": _normalize_file_records(bundle.get("outputs", [])),
+                "patches": normalize(bundle.get("patches", [])),
+                "outputs": normalize(bundle.get("outputs", [])),
             }
         )
     return sorted(normalized, key=lambda item: item["bundle_id"])
 
 
-def make_snapshot(
-    inputs: Sequence[FileRecord] | Sequence[dict[str, object]],
-    outputs: Sequence[FileRecord] | Sequence[dict[str, object]],
+_CANONICAL_BATCH_SIZE = 1024
+
+
+def _iter_canonical_chunks(data: object) -> Iterator[bytes]:
+    if isinstance(data, FileRecordTable):
+        yield from data.iter_canonical_json()
+    elif isinstance(data, dict):
+        yield b"{"
+        for position, key in enumerate(sorted(data)):
+            yield (b"," if position else b"") + canonical_json_bytes(key) + b":"
+            yield from _iter_canonical_chunks(data[key])
+        yield b"}"
+    elif isinstance(data, (list, tuple, Iterator)):
+        yield b"["
+        separator = b""
+        batch: list[object] = []
+        for item in data:
+            if isinstance(item, (FileRecordTable, Iterator)):
+                if batch:
+                    yield separator
+                    yield from _iter_canonical_batch(batch)
+                    separator = b","
+                    batch = []
+                yield separator
+                yield from _iter_canonical_chunks(item)
+                separator = b","
+                continue
+            batch.append(item)
+            if len(batch) == _CANONICAL_BATCH_SIZE:
+                yield separator
+                yield from _iter_canonical_batch(batch)
+                separator = b","
+                batch = []
+        if batch:
+            yield separator
+            yield from _iter_canonical_batch(batch)
+        yield b"]"
+    else:
+        yield canonical_json_bytes(data)
+
+
+def _iter_canonical_batch(batch: list[object]) -> Iterator[bytes]:
+    try:
+        yield canonical_json_bytes(batch)[1:-1]
+    except TypeError:
+        for position, item in enumerate(batch):
+            if position:
+                yield b","
+            yield from _iter_canonical_chunks(item)
+
+
+def _write_canonical_with_hash(
+    destination: Path,
+    payload: dict[str, object],
+    hash_field: str,
     *,
-    output_bundles: Sequence[dict[str, object]] | None = None,
-    patch_bundles: Sequence[dict[str, object]] | None = None,
-    profile_id: str | None = None,
-    profile_version: str | None = None,
-    device: str | None = None,
-    created_at: str | None = None,
-    contract_version: str = CONTRACT_VERSION,
+    fsync: str = "none",
+) -> str:
+    keys = sorted(payload)
+    head = [key for key in keys if key < hash_field]
+    tail = [key for key in keys if key > hash_field]
+    if not head:
+        raise ValueError(f"{hash_field} must not sort before every other field")
+    hasher = hashlib.sha256()
+    with storage.open_atomic(destination, fsync=fsync) as handle:
+        for position, key in enumerate(head):
+            chunks = _iter_canonical_chunks(payload[key])
+            prefix = (b"," if position else b"{") + canonical_json_bytes(key) + b":"
+            for chunk in itertools.chain([prefix], chunks):
+                hasher.update(chunk)
+                handle.write(chunk)
+        tail_bytes = b"".join(
+            b"," + canonical_json_bytes(key) + b":" + b"".join(_iter_canonical_chunks(payload[key])) for key in tail
+        )
+        hasher.update(tail_bytes + b"}")
+        digest = f"sha256:{hasher.hexdigest()}"
+        handle.write(b"," + canonical_json_bytes(hash_field) + b":" + canonical_json_bytes(digest) + tail_bytes + b"}")
+    return digest
+
+
+def _snapshot_payload(
+    inputs: FileRecords,
+    outputs: FileRecords,
+    *,
+    output_bundles: Sequence[dict[str, object]] | None,
+    patch_bundles: Sequence[dict[str, object]] | None,
+    profile_id: str | None,
+    profile_version: str | None,
+    device: str | None,
+    created_at: str | None,
+    contract_version: str,
+    normalize: Callable[[FileRecords], object] = _normalize_file_records,
 ) -> dict[str, object]:
     created = created_at or _deterministic_timestamp()
-    normalized_output_bundles = _normalize_output_bundles(output_bundles or [])
-    normalized_patch_bundles = _normalize_patch_bundles(patch_bundles or [])
+    normalized_output_bundles = _normalize_output_bundles(output_bundles or [], normalize)
+    normalized_patch_bundles = _normalize_patch_bundles(patch_bundles or [], normalize)
 
     payload = {
         "contract_version": contract_version,
         "created_at": created,
-        "inputs": _normalize_file_records(inputs),
-        "outputs": _normalize_file_records(outputs),
+        "inputs": normalize(inputs),
+        "outputs": normalize(outputs),
         "output_bundles": normalized_output_bundles,
         "patch_bundles": normalized_patch_bundles,
     }
@@ -151,6 +531,32 @@ def make_snapshot(
         payload["profile_version"] = profile_version
     if device is not None:
         payload["device"] = device
+    return payload
+
+
+def make_snapshot(
+    inputs: FileRecords,
+    outputs: FileRecords,
+    *,
+    output_bundles: Sequence[dict[str, object]] | None = None,
+    patch_bundles: Sequence[dict[str, object]] | None = None,
+    profile_id: str | None = None,
+    profile_version: str | None = None,
+    device: str | None = None,
+    created_at: str | None = None,
+    contract_version: str = CONTRACT_VERSION,
+) -> dict[str, object]:
+    payload = _snapshot_payload(
+        inputs,
+        outputs,
+        output_bundles=output_bundles,
+        patch_bundles=patch_bundles,
+        profile_id=profile_id,
+        profile_version=profile_version,
+        device=device,
+        created_at=created_at,
+        contract_version=contract_version,
+    )
     snapshot_hash = _hash_bytes(canonical_json_bytes(payload))
     payload["snapshot_hash"] = snapshot_hash
     return payload
@@ -178,14 +584,15 @@ def _default_agent_headers() -> dict[str, str]:
 
 
 def _collect_output_hashes(snapshot: dict[str, object]) -> list[dict[str, object]]:
-    output_records: list[dict[str, object]] = []
-    output_records.extend(_normalize_file_records(snapshot.get("outputs", [])))
+    output_records = FileRecordTable()
+    output_records.extend(snapshot.get("outputs", []))
     for bundle in snapshot.get("output_bundles", []) or []:
-        output_records.extend(_normalize_file_records(bundle.get("files", [])))
+        output_records.extend(bundle.get("files", []))
     for bundle in snapshot.get("patch_bundles", []) or []:
-        output_records.extend(_normalize_file_records(bundle.get("patches", [])))
-        output_records.extend(_normalize_file_records(bundle.get("outputs", [])))
-    return sorted(output_records, key=lambda item: (item["path"], item["hash"]))
+        output_records.extend(bundle.get("patches", []))
+        output_records.extend(bundle.get("outputs", []))
+    output_records.sort(by_hash=True)
+    return list(output_records.as_dicts())
 
 
 def _normalize_run_steps(steps: Sequence[dict[str, object]]) -> list[dict[str, object]]:
@@ -231,14 +638,43 @@ def make_receipt(
     run_steps: Sequence[dict[str, object]] | None = None,
     dataset_fixture: dict[str, object] | None = None,
 ) -> dict[str, object]:
-    created = created_at or _deterministic_timestamp()
     snapshot_hash = snapshot.get("snapshot_hash")
     if not snapshot_hash:
         snapshot_hash = _hash_bytes(
             canonical_json_bytes({k: v for k, v in snapshot.items() if k != "snapshot_hash"})
         )
+    payload = _receipt_payload(
+        snapshot_hash,
+        snapshot.get("contract_version"),
+        _collect_output_hashes(snapshot),
+        agent_headers=agent_headers,
+        created_at=created_at,
+        contract_version=contract_version,
+        policy_pack=policy_pack,
+        reasoning_pack=reasoning_pack,
+        run_steps=run_steps,
+        dataset_fixture=dataset_fixture,
+    )
+    receipt_hash = _hash_bytes(canonical_json_bytes(payload))
+    payload["receipt_hash"] = receipt_hash
+    return payload
+
+
+def _receipt_payload(
+    snapshot_hash: str,
+    snapshot_contract_version: object,
+    output_hashes: Sequence[dict[str, object]] | Iterator[dict[str, object]],
+    *,
+    agent_headers: dict[str, str] | None,
+    created_at: str | None,
+    contract_version: str,
+    policy_pack: dict[str, str] | None,
+    reasoning_pack: dict[str, str] | None,
+    run_steps: Sequence[dict[str, object]] | None,
+    dataset_fixture: dict[str, object] | None,
+) -> dict[str, object]:
+    created = created_at or _deterministic_timestamp()
     agent = agent_headers or _default_agent_headers()
-    output_hashes = _collect_output_hashes(snapshot)
 
     payload = {
         "contract_version": contract_version,
@@ -253,7 +689,7 @@ def make_receipt(
         },
         "snapshot": {
             "hash": snapshot_hash,
-            "contract_version": snapshot.get("contract_version"),
+            "contract_version": snapshot_contract_version,
         },
         "snapshot_hash": snapshot_hash,
         "output_hashes": output_hashes,
@@ -279,47 +715,651 @@ def make_receipt(
     normalized_fixture = _normalize_dataset_fixture(dataset_fixture)
     if normalized_fixture:
         payload["dataset_fixture"] = normalized_fixture
-    receipt_hash = _hash_bytes(canonical_json_bytes(payload))
-    payload["receipt_hash"] = receipt_hash
     return payload
 
 
 def load_state(path: str | Path) -> dict[str, object]:
-    data = Path(path).read_text(encoding="utf-8")
+    data = storage.read_bytes(path).decode("utf-8")
     return json.loads(data)
 
 
-def save_state(path: str | Path, state: dict[str, object]) -> None:
+def save_state(path: str | Path, state: dict[str, object], *, fsync: str = "none") -> None:
     content = canonical_json_bytes(state)
-    Path(path).write_bytes(content)
+    storage.write_bytes(path, content, fsync=fsync)
 
 
-def build_snapshot_from_dirs(input_dir: Path, output_dir: Path) -> dict[str, object]:
-    inputs = _collect_files(input_dir)
-    outputs = _collect_files(output_dir)
-    return make_snapshot(inputs, outputs)
+def _selector_list(value: object, label: str) -> list[str]:
+    selectors = [value] if isinstance(value, str) else value
+    if not isinstance(selectors, list) or not all(isinstance(item, str) for item in selectors):
+        raise ValueError(f"{label} must be a path, glob, or list of them")
+    return selectors
+
+
+def _selector_matches(path: str, selector: str) -> bool:
+    prefix = selector.rstrip("/")
+    return path == prefix or path.startswith(prefix + "/") or fnmatch.fnmatchcase(path, selector)
+
+
+def _select_records(
+    records: FileRecordTable,
+    selectors: Sequence[str],
+    label: str,
+) -> list[FileRecordView]:
+    selected = []
+    unmatched = dict.fromkeys(selectors)
+    for record in records:
+        matched = False
+        for selector in selectors:
+            if _selector_matches(record.path, selector):
+                if not matched:
+                    selected.append(record)
+                    matched = True
+                unmatched.pop(selector, None)
+                if not unmatched:
+                    break
+    if unmatched:
+        raise ValueError(f"{label} selector {next(iter(unmatched))!r} matches no output file")
+    return selected
+
+
+def _resolve_bundle_spec(
+    spec: Mapping[str, object],
+    records: FileRecordTable,
+) -> tuple[list[dict[str, object]], list[dict[str, object]]]:
+    unknown = set(spec) - {"output_bundles", "patch_bundles"}
+    if unknown:
+        raise ValueError(f"unknown bundle spec sections: {sorted(unknown)}")
+    for section in ("output_bundles", "patch_bundles"):
+        if not isinstance(spec.get(section) or {}, dict):
+            raise ValueError(f"{section} must map bundle_id to its files")
+    output_bundles = []
+    for bundle_id, selectors in (spec.get("output_bundles") or {}).items():
+        label = f"output_bundles.{bundle_id}"
+        output_bundles.append(
+            {
+                "bundle_id": bundle_id,
+                "files": _select_records(records, _selector_list(selectors, label), label),
+            }
+        )
+    patch_bundles = []
+    for bundle_id, bundle in (spec.get("patch_bundles") or {}).items():
+        if not isinstance(bundle, dict) or not isinstance(bundle.get("base_path"), str):
+            raise ValueError(f"patch_bundles.{bundle_id} requires a base_path")
+        unknown = set(bundle) - {"base_path", "patches", "outputs"}
+        if unknown:
+            raise ValueError(f"unknown fields in patch_bundles.{bundle_id}: {sorted(unknown)}")
+        resolved = {"bundle_id": bundle_id, "base_path": bundle["base_path"]}
+        for field in ("patches", "outputs"):
+            label = f"patch_bundles.{bundle_id}.{field}"
+            resolved[field] = _select_records(records, _selector_list(bundle.get(field, []), label), label)
+        patch_bundles.append(resolved)
+    return output_bundles, patch_bundles
+
+
+def build_snapshot_from_dirs(
+    input_dir: Path,
+    output_dir: Path,
+    *,
+    bundle_spec: Mapping[str, object] | None = None,
+) -> dict[str, object]:
+    memo = _DigestMemo(shared_only=True)
+    inputs = _collect_files(input_dir, memo)
+    outputs = _collect_files(output_dir, memo)
+    output_bundles, patch_bundles = _resolve_bundle_spec(bundle_spec or {}, outputs)
+    return make_snapshot(inputs, outputs, output_bundles=output_bundles, patch_bundles=patch_bundles)
+
+
+def write_snapshot_from_dirs(
+    input_dir: Path,
+    output_dir: Path,
+    destination: Path,
+    *,
+    bundle_spec: Mapping[str, object] | None = None,
+    fsync: str = "none",
+) -> str:
+    memo = _DigestMemo(shared_only=True)
+    inputs = _collect_files(input_dir, memo)
+    outputs = _collect_files(output_dir, memo)
+    output_bundles, patch_bundles = _resolve_bundle_spec(bundle_spec or {}, outputs)
+    payload = _snapshot_payload(
+        inputs,
+        outputs,
+        output_bundles=output_bundles,
+        patch_bundles=patch_bundles,
+        profile_id=None,
+        profile_version=None,
+        device=None,
+        created_at=None,
+        contract_version=CONTRACT_VERSION,
+        normalize=_file_record_table,
+    )
+    return _write_canonical_with_hash(destination, payload, "snapshot_hash", fsync=fsync)
+
+
+def _tree_entries_hash(root: Path) -> str:
+    names = [root.name] if root.is_file() else sorted(entry.name for _, entry in _sorted_entries(str(root), ""))
+    return _hash_bytes(canonical_json_bytes(names))
+
+
+def _capture_identity(input_dir: Path, output_dir: Path, run_id: str | None) -> dict[str, object]:
+    input_root = input_dir.resolve()
+    output_root = output_dir.resolve()
+    return {
+        "run_id": run_id,
+        "input_root": input_root.as_posix(),
+        "output_root": output_root.as_posix(),
+        "input_entries": _tree_entries_hash(input_root),
+        "output_entries": _tree_entries_hash(output_root),
+    }
+
+
+def make_snapshot_shard(
+    input_dir: Path,
+    output_dir: Path,
+    shard_index: int,
+    shard_count: int,
+    *,
+    run_id: str | None = None,
+    contract_version: str = CONTRACT_VERSION,
+) -> dict[str, object]:
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"invalid shard {shard_index}/{shard_count}")
+    return {
+        "contract_version": contract_version,
+        "shard": {"index": shard_index, "count": shard_count},
+        "capture": _capture_identity(input_dir, output_dir, run_id),
+        "inputs": _normalize_file_records(_collect_shard_files(input_dir, shard_index, shard_count)),
+        "outputs": _normalize_file_records(_collect_shard_files(output_dir, shard_index, shard_count)),
+    }
+
+
+def _merge_shard_section(shards: Sequence[dict[str, object]], section: str) -> list[dict[str, object]]:
+    merged: list[dict[str, object]] = []
+    previous = None
+    streams = [_normalize_file_records(shard.get(section, [])) for shard in shards]
+    for record in heapq.merge(*streams, key=lambda item: item["path"]):
+        if record["path"] == previous:
+            raise ValueError(f"path {record['path']!r} appears in more than one shard")
+        previous = record["path"]
+        merged.append(record)
+    return merged
+
+
+def merge_snapshot_shards(
+    shards: Sequence[dict[str, object]],
+    *,
+    created_at: str | None = None,
+) -> dict[str, object]:
+    if not shards:
+        raise ValueError("no shards to merge")
+    shard_count = shards[0]["shard"]["count"]
+    indices = sorted(shard["shard"]["index"] for shard in shards)
+    if any(shard["shard"]["count"] != shard_count for shard in shards) or indices != list(range(shard_count)):
+        raise ValueError(f"expected exactly one shard per index 0..{shard_count - 1}, got {indices}")
+    versions = {shard["contract_version"] for shard in shards}
+    if len(versions) != 1:
+        raise ValueError(f"shards disagree on contract_version: {sorted(versions)}")
+    captures = [shard.get("capture") for shard in shards]
+    for field in ("run_id", "input_root", "output_root", "input_entries", "output_entries"):
+        values = {canonical_json_bytes((capture or {}).get(field)) for capture in captures}
+        if len(values) != 1:
+            raise ValueError(f"shards come from different captures: they disagree on {field}")
+    return make_snapshot(
+        _merge_shard_section(shards, "inputs"),
+        _merge_shard_section(shards, "outputs"),
+        created_at=created_at,
+        contract_version=versions.pop(),
+    )
 
 
 def build_receipt_from_snapshot(snapshot_path: Path) -> dict[str, object]:
-    snapshot = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    snapshot = load_state(snapshot_path)
     return make_receipt(snapshot)
 
 
+_JSON_WHITESPACE = " \t\n\r"
+_JSON_DECODER = json.JSONDecoder()
+
+
+class _NotStreamable(Exception):
+    pass
+
+
+class _JsonStreamReader:
+    def __init__(self, handle: BufferedIOBase, offset: int = 0, chunk_size: int = 1 << 20) -> None:
+        self._handle = handle
+        self._read_offset = offset
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._tell_position = 0
+        self._tell_offset = offset
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        self._handle.seek(self._read_offset)
+        data = self._handle.read(self._chunk_size)
+        self._read_offset += len(data)
+        self._eof = not data
+        text = self._decoder.decode(data, final=self._eof)
+        if self._position:
+            self.tell()
+            self._buffer = self._buffer[self._position :]
+            self._position = 0
+            self._tell_position = 0
+        self._buffer += text
+        return True
+
+    def tell(self) -> int:
+        if self._tell_position != self._position:
+            self._tell_offset += len(self._buffer[self._tell_position : self._position].encode("utf-8"))
+            self._tell_position = self._position
+        return self._tell_offset
+
+    def peek(self) -> str:
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in _JSON_WHITESPACE:
+                position += 1
+            self._position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._fill():
+                return ""
+
+    def accept(self, token: str) -> bool:
+        if self.peek() != token:
+            return False
+        self._position += 1
+        return True
+
+    def expect(self, token: str) -> None:
+        if not self.accept(token):
+            raise _NotStreamable(f"expected {token!r} at byte {self.tell()}")
+
+    def value(self) -> object:
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def iter_array(self) -> Iterator[None]:
+        self.expect("[")
+        if self.accept("]"):
+            return
+        while True:
+            yield None
+            if not self.accept(","):
+                self.expect("]")
+                return
+
+    def iter_object(self) -> Iterator[str]:
+        self.expect("{")
+        if self.accept("}"):
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise _NotStreamable(f"expected an object key at byte {self.tell()}")
+            self.expect(":")
+            yield key
+            if not self.accept(","):
+                self.expect("}")
+                return
+
+
+def _scan_record_section(reader: _JsonStreamReader) -> tuple[int, int]:
+    reader.peek()
+    offset = reader.tell()
+    previous = None
+    for _ in reader.iter_array():
+        record = reader.value()
+        if not isinstance(record, dict) or not isinstance(record.get("path"), str) or "hash" not in record:
+            raise _NotStreamable("file records must be objects with path and hash")
+        if previous is not None and record["path"] < previous:
+            raise _NotStreamable("file records are not sorted by path")
+        previous = record["path"]
+    return offset, reader.tell()
+
+
+def _scan_bundles(reader: _JsonStreamReader, fields: tuple[str, ...]) -> list[tuple[int, int]]:
+    offsets = []
+    for _ in reader.iter_array():
+        bundle_offsets = {}
+        for key in reader.iter_object():
+            if key in bundle_offsets:
+                raise _NotStreamable(f"duplicate bundle field {key!r}")
+            if key in fields:
+                bundle_offsets[key] = _scan_record_section(reader)
+            else:
+                reader.value()
+        offsets.extend(bundle_offsets[field] for field in fields if field in bundle_offsets)
+    return offsets
+
+
+def _scan_snapshot(reader: _JsonStreamReader) -> tuple[dict[str, object], list[tuple[int, int]]]:
+    meta: dict[str, object] = {}
+    sections: dict[str, list[tuple[int, int]]] = {}
+    seen = set()
+    for key in reader.iter_object():
+        if key in seen:
+            raise _NotStreamable(f"duplicate snapshot field {key!r}")
+        seen.add(key)
+        if key == "inputs":
+            for _ in reader.iter_array():
+                reader.value()
+        elif key == "outputs":
+            sections[key] = [_scan_record_section(reader)]
+        elif key == "output_bundles":
+            sections[key] = _scan_bundles(reader, ("files",))
+        elif key == "patch_bundles":
+            sections[key] = _scan_bundles(reader, ("patches", "outputs"))
+        else:
+            meta[key] = reader.value()
+    if reader.peek():
+        raise _NotStreamable("unexpected data after the snapshot object")
+    offsets = []
+    for key in ("outputs", "output_bundles", "patch_bundles"):
+        offsets.extend(sections.get(key, []))
+    return meta, offsets
+
+
+_STREAM_RECEIPT_THRESHOLD = 1 << 24
+_SECTION_CHUNK_SIZE = 1 << 14
+_MERGE_FAN_IN = 256
+
+
+def _iter_section_output_hashes(
+    handle: BufferedIOBase,
+    offset: int,
+    chunk_size: int = _SECTION_CHUNK_SIZE,
+) -> Iterator[dict[str, object]]:
+    reader = _JsonStreamReader(handle, offset, chunk_size=chunk_size)
+    run: list[dict[str, object]] = []
+    for _ in reader.iter_array():
+        record = reader.value()
+        if run and run[0]["path"] != record["path"]:
+            run.sort(key=lambda item: item["hash"])
+            yield from run
+            run = []
+        run.append({"path": record["path"], "hash": record["hash"], "size": record.get("size", 0)})
+    run.sort(key=lambda item: item["hash"])
+    yield from run
+
+
+def _merge_sections(handle: BufferedIOBase, sections: Sequence[tuple[int, int]]) -> Iterator[dict[str, object]]:
+    return heapq.merge(
+        *(
+            _iter_section_output_hashes(handle, start, max(1, min(end - start, _SECTION_CHUNK_SIZE)))
+            for start, end in sections
+        ),
+        key=lambda item: (item["path"], item["hash"]),
+    )
+
+
+def _iter_merged_output_hashes(
+    handle: BufferedIOBase,
+    sections: Sequence[tuple[int, int]],
+) -> Iterator[dict[str, object]]:
+    spills = []
+    try:
+        while len(sections) > _MERGE_FAN_IN:
+            import tempfile
+
+            spill = tempfile.TemporaryFile()
+            spills.append(spill)
+            runs = []
+            for index in range(0, len(sections), _MERGE_FAN_IN):
+                start = spill.tell()
+                for chunk in _iter_canonical_chunks(_merge_sections(handle, sections[index : index + _MERGE_FAN_IN])):
+                    spill.write(chunk)
+                runs.append((start, spill.tell()))
+            handle, sections = spill, runs
+        yield from _merge_sections(handle, sections)
+    finally:
+        for spill in spills:
+            spill.close()
+
+
+def write_receipt_from_snapshot(
+    snapshot_path: Path,
+    destination: Path,
+    *,
+    agent_headers: dict[str, str] | None = None,
+    created_at: str | None = None,
+    fsync: str = "none",
+) -> str:
+    with snapshot_path.open("rb") as handle:
+        try:
+            if storage.detect_compression(snapshot_path) is not None:
+                raise _NotStreamable("snapshot is compressed")
+            if os.fstat(handle.fileno()).st_size < _STREAM_RECEIPT_THRESHOLD:
+                raise _NotStreamable("snapshot is small enough to load")
+            meta, offsets = _scan_snapshot(_JsonStreamReader(handle))
+            if not meta.get("snapshot_hash"):
+                raise _NotStreamable("snapshot has no snapshot_hash")
+        except (_NotStreamable, ValueError):
+            snapshot = load_state(snapshot_path)
+            receipt = make_receipt(snapshot, agent_headers=agent_headers, created_at=created_at)
+            storage.write_bytes(destination, canonical_json_bytes(receipt), fsync=fsync)
+            return receipt["receipt_hash"]
+
+        output_hashes = _iter_merged_output_hashes(handle, offsets)
+        payload = _receipt_payload(
+            meta["snapshot_hash"],
+            meta.get("contract_version"),
+            output_hashes,
+            agent_headers=agent_headers,
+            created_at=created_at,
+            contract_version=CONTRACT_VERSION,
+            policy_pack=None,
+            reasoning_pack=None,
+            run_steps=None,
+            dataset_fixture=None,
+        )
+        return _write_canonical_with_hash(destination, payload, "receipt_hash", fsync=fsync)
+
+
+def _batch_receipt_name(snapshot_path: Path) -> str:
+    if snapshot_path.name.endswith("snapshot.json"):
+        return snapshot_path.name[: -len("snapshot.json")] + "receipt.json"
+    return f"{snapshot_path.stem}.receipt.json"
+
+
+def _batch_receipt_paths(snapshot_paths: Sequence[Path], output_dir: Path | None) -> list[Path]:
+    if output_dir is None:
+        destinations = [path.parent / _batch_receipt_name(path) for path in snapshot_paths]
+    else:
+        parents = [path.resolve().parent for path in snapshot_paths]
+        base = Path(os.path.commonpath(parents))
+        destinations = [
+            output_dir / parent.relative_to(base) / _batch_receipt_name(path)
+            for path, parent in zip(snapshot_paths, parents)
+        ]
+    seen: dict[Path, Path] = {}
+    for snapshot_path, destination in zip(snapshot_paths, destinations):
+        other = seen.setdefault(destination.resolve(), snapshot_path)
+        if other != snapshot_path:
+            raise ValueError(f"{other} and {snapshot_path} would both write {destination}")
+    return destinations
+
+
+def _write_batch_receipt(job: tuple[str, str, dict[str, str], str, str]) -> tuple[str | None, str | None]:
+    snapshot_path, destination, agent_headers, created_at, fsync = job
+    target = Path(destination)
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        receipt_hash = write_receipt_from_snapshot(
+            Path(snapshot_path), target, agent_headers=agent_headers, created_at=created_at, fsync=fsync
+        )
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+    return receipt_hash, None
+
+
+def make_receipts(
+    snapshot_paths: Sequence[Path],
+    *,
+    output_dir: Path | None = None,
+    workers: int | None = None,
+    agent_headers: dict[str, str] | None = None,
+    created_at: str | None = None,
+    fsync: str = "none",
+) -> list[dict[str, str | None]]:
+    snapshot_paths = [Path(path) for path in snapshot_paths]
+    if not snapshot_paths:
+        return []
+    destinations = _batch_receipt_paths(snapshot_paths, output_dir)
+    agent = agent_headers or _default_agent_headers()
+    created = created_at or _deterministic_timestamp()
+    jobs = [
+        (str(snapshot_path), str(destination), agent, created, fsync)
+        for snapshot_path, destination in zip(snapshot_paths, destinations)
+    ]
+    worker_count = min(workers or os.cpu_count() or 1, len(jobs))
+    if worker_count <= 1:
+        outcomes = [_write_batch_receipt(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(jobs) // (worker_count * 4))
+        with ProcessPoolExecutor(max_workers=worker_count) as executor:
+            outcomes = list(executor.map(_write_batch_receipt, jobs, chunksize=chunksize))
+    return [
+        {
+            "snapshot": snapshot_path.as_posix(),
+            "receipt": destination.as_posix(),
+            "receipt_hash": receipt_hash,
+            "error": error,
+        }
+        for snapshot_path, destination, (receipt_hash, error) in zip(snapshot_paths, destinations, outcomes)
+    ]
+
+
 def _load_schema(name: str) -> dict[str, object]:
     root = Path(__file__).resolve().parents[2]
     schema_path = root / "schemas" / name
     return json.loads(schema_path.read_text(encoding="utf-8"))
 
 
-def _validate_schema(payload: dict[str, object], schema_name: str) -> tuple[bool, str | None]:
+@functools.lru_cache(maxsize=None)
+def _schema_validator(schema_name: str) -> tuple[object, Callable[..., object]]:
     import jsonschema
 
     schema = _load_schema(schema_name)
-    try:
-        jsonschema.validate(payload, schema)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema), jsonschema.exceptions.best_match
+
+
+def _validate_schema(payload: dict[str, object], schema_name: str) -> tuple[bool, str | None]:
+    validator, best_match = _schema_validator(schema_name)
+    error = best_match(validator.iter_errors(payload))
+    if error is None:
         return True, None
-    except jsonschema.ValidationError as exc:
-        return False, exc.message
+    return False, error.message
+
+
+_SELF_HASH_FIELDS = {
+    "report_hash": ("report_hash", "hash_stats", "cached"),
+    "receipt_hash": ("receipt_hash",),
+    "snapshot_hash": ("snapshot_hash",),
+}
+
+
+def compute_self_hash(document: object) -> tuple[str, str] | None:
+    if not isinstance(document, dict):
+        return None
+    for field, excluded in _SELF_HASH_FIELDS.items():
+        if field in document:
+            payload = {k: v for k, v in document.items() if k not in excluded}
+            return field, _hash_bytes(canonical_json_bytes(payload))
+    return None
+
+
+_STREAM_HASH_THRESHOLD = 1 << 24
+
+
+def _iter_canonical_array(reader: _JsonStreamReader, batch_size: int = 1024) -> Iterator[bytes]:
+    yield b"["
+    separator = b""
+    batch: list[object] = []
+    for _ in reader.iter_array():
+        batch.append(reader.value())
+        if len(batch) == batch_size:
+            yield separator + canonical_json_bytes(batch)[1:-1]
+            separator = b","
+            batch = []
+    if batch:
+        yield separator + canonical_json_bytes(batch)[1:-1]
+    yield b"]"
+
+
+def _stream_self_hash(handle: BufferedIOBase) -> tuple[str, object, str] | None:
+    reader = _JsonStreamReader(handle)
+    hashers = {field: hashlib.sha256(b"{") for field in _SELF_HASH_FIELDS}
+    started: set[object] = set()
+    claimed: dict[str, object] = {}
+    previous = None
+    for key in reader.iter_object():
+        if previous is not None and key <= previous:
+            raise _NotStreamable("top-level keys are not in canonical order")
+        previous = key
+        targets = [hashers[field] for field, excluded in _SELF_HASH_FIELDS.items() if key not in excluded]
+        prefix = canonical_json_bytes(key) + b":"
+        for hasher in targets:
+            hasher.update(b"," + prefix if hasher in started else prefix)
+            started.add(hasher)
+        if reader.peek() == "[" and key not in _SELF_HASH_FIELDS:
+            chunks = _iter_canonical_array(reader)
+        else:
+            value = reader.value()
+            if key in _SELF_HASH_FIELDS:
+                claimed[key] = value
+            chunks = iter([canonical_json_bytes(value)])
+        for chunk in chunks:
+            for hasher in targets:
+                hasher.update(chunk)
+    if reader.peek():
+        raise _NotStreamable("unexpected data after the top-level object")
+    for field in _SELF_HASH_FIELDS:
+        if field in claimed:
+            hasher = hashers[field]
+            hasher.update(b"}")
+            return field, claimed[field], f"sha256:{hasher.hexdigest()}"
+    return None
+
+
+def compute_file_self_hash(path: str | Path) -> tuple[str, object, str] | None:
+    with open(path, "rb") as handle:
+        head = handle.read(4)
+        if storage.compression_from_magic(head) is not None:
+            data = storage.read_bytes(path)
+        else:
+            if os.fstat(handle.fileno()).st_size >= _STREAM_HASH_THRESHOLD:
+                try:
+                    return _stream_self_hash(handle)
+                except _NotStreamable:
+                    handle.seek(len(head))
+            data = head + handle.read()
+    document = json.loads(data.decode("utf-8"))
+    self_hash = compute_self_hash(document)
+    if self_hash is None:
+        return None
+    field, calculated = self_hash
+    return field, document[field], calculated
 
 
 def _validate_receipt_hash(receipt: dict[str, object]) -> bool:
@@ -329,27 +1369,19 @@ def _validate_receipt_hash(receipt: dict[str, object]) -> bool:
     return expected == calculated
 
 
-def build_replay_report(receipt_path: Path, root_dir: Path) -> dict[str, object]:
-    receipt = json.loads(receipt_path.read_text(encoding="utf-8"))
-    schema_valid, schema_error = _validate_schema(receipt, "execution_receipt.schema.json")
-    receipt_hash_match = _validate_receipt_hash(receipt) if schema_valid else False
-
-    output_entries = receipt.get("output_hashes", []) if isinstance(receipt, dict) else []
-    output_entries = _normalize_file_records(output_entries)
+def _verify_outputs(
+    entries: Sequence[dict[str, object]],
+    root_dir: Path,
+    memo: _DigestMemo,
+) -> list[dict[str, object]]:
     output_results = []
-    missing_count = 0
-    mismatch_count = 0
-    for entry in output_entries:
+    for entry in entries:
         path = entry["path"]
         expected_hash = entry["hash"]
         file_path = root_dir / path
         exists = file_path.exists()
-        actual_hash = _hash_file(file_path) if exists else None
+        actual_hash = memo.hash_file(file_path) if exists else None
         hash_match = exists and actual_hash == expected_hash
-        if not exists:
-            missing_count += 1
-        if exists and not hash_match:
-            mismatch_count += 1
         output_results.append(
             {
                 "path": path,
@@ -359,32 +1391,53 @@ def build_replay_report(receipt_path: Path, root_dir: Path) -> dict[str, object]
                 "hash_match": hash_match,
             }
         )
+    return output_results
 
-    dataset_fixture = receipt.get("dataset_fixture") if isinstance(receipt, dict) else None
-    fixture_result = None
+
+def _verify_dataset_fixture(
+    dataset_fixture: object,
+    root_dir: Path,
+    memo: _DigestMemo,
+) -> dict[str, object] | None:
+    if not isinstance(dataset_fixture, dict):
+        return None
+    fixture_path_value = dataset_fixture.get("path")
+    fixture_path = root_dir / fixture_path_value if fixture_path_value else None
+    exists = fixture_path.exists() if fixture_path else None
+    actual_hash = memo.hash_file(fixture_path) if fixture_path and exists else None
+    expected_hash = dataset_fixture.get("hash")
+    hash_match = None
+    if expected_hash is not None:
+        hash_match = exists and actual_hash == expected_hash if exists is not None else None
+    return {
+        "id": dataset_fixture.get("id"),
+        "path": fixture_path_value,
+        "expected_hash": expected_hash,
+        "exists": exists,
+        "actual_hash": actual_hash,
+        "hash_match": hash_match,
+    }
+
+
+def _finalize_replay_report(
+    receipt_path: str,
+    root: str,
+    schema_valid: bool,
+    schema_error: str | None,
+    receipt_hash_match: bool,
+    output_results: list[dict[str, object]],
+    fixture_result: dict[str, object] | None,
+    hash_stats: dict[str, int],
+) -> dict[str, object]:
+    missing_count = sum(1 for result in output_results if not result["exists"])
+    mismatch_count = sum(1 for result in output_results if result["exists"] and not result["hash_match"])
     fixture_missing = 0
     fixture_mismatch = 0
-    if isinstance(dataset_fixture, dict):
-        fixture_path_value = dataset_fixture.get("path")
-        fixture_path = root_dir / fixture_path_value if fixture_path_value else None
-        exists = fixture_path.exists() if fixture_path else None
-        actual_hash = _hash_file(fixture_path) if fixture_path and exists else None
-        expected_hash = dataset_fixture.get("hash")
-        hash_match = None
-        if expected_hash is not None:
-            hash_match = exists and actual_hash == expected_hash if exists is not None else None
-            if exists is False:
-                fixture_missing = 1
-            if exists and hash_match is False:
-                fixture_mismatch = 1
-        fixture_result = {
-            "id": dataset_fixture.get("id"),
-            "path": fixture_path_value,
-            "expected_hash": expected_hash,
-            "exists": exists,
-            "actual_hash": actual_hash,
-            "hash_match": hash_match,
-        }
+    if fixture_result is not None and fixture_result["expected_hash"] is not None:
+        if fixture_result["exists"] is False:
+            fixture_missing = 1
+        if fixture_result["exists"] and fixture_result["hash_match"] is False:
+            fixture_mismatch = 1
 
     summary = {
         "ok": (
@@ -405,8 +1458,8 @@ def build_replay_report(receipt_path: Path, root_dir: Path) -> dict[str, object]
     payload = {
         "contract_version": CONTRACT_VERSION,
         "created_at": _deterministic_timestamp(),
-        "receipt_path": receipt_path.as_posix(),
-        "root": root_dir.as_posix(),
+        "receipt_path": receipt_path,
+        "root": root,
         "schema_valid": schema_valid,
         "schema_error": schema_error,
         "receipt_hash_match": receipt_hash_match,
@@ -416,4 +1469,222 @@ def build_replay_report(receipt_path: Path, root_dir: Path) -> dict[str, object]
     }
     report_hash = _hash_bytes(canonical_json_bytes(payload))
     payload["report_hash"] = report_hash
+    payload["hash_stats"] = hash_stats
     return payload
+
+
+def _load_receipt_for_replay(receipt_path: Path) -> tuple[object, str, list[dict[str, object]]]:
+    raw = storage.read_bytes(receipt_path)
+    receipt = json.loads(raw.decode("utf-8"))
+    output_entries = receipt.get("output_hashes", []) if isinstance(receipt, dict) else []
+    return receipt, _hash_bytes(raw), _normalize_file_records(output_entries)
+
+
+_REPLAY_CACHE_VERSION = 1
+_REPLAY_CACHE_RACY_NS = 2_000_000_000
+
+
+def _file_fingerprint(path: Path) -> list[int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino]
+
+
+def _replay_fingerprints(
+    root_dir: Path,
+    output_entries: Sequence[dict[str, object]],
+    dataset_fixture: object,
+) -> dict[str, list[int] | None]:
+    paths = {entry["path"] for entry in output_entries}
+    if isinstance(dataset_fixture, dict) and dataset_fixture.get("path"):
+        paths.add(dataset_fixture["path"])
+    return {path: _file_fingerprint(root_dir / path) for path in sorted(paths)}
+
+
+def _replay_cache_path(cache_dir: Path, receipt: object, root_dir: Path) -> Path | None:
+    root = root_dir.resolve()
+    try:
+        root_stat = root.stat()
+    except OSError:
+        return None
+    identity = {
+        "receipt_hash": receipt.get("receipt_hash") if isinstance(receipt, dict) else None,
+        "root": root.as_posix(),
+        "root_device": root_stat.st_dev,
+        "root_inode": root_stat.st_ino,
+    }
+    key = hashlib.sha256(canonical_json_bytes(identity)).hexdigest()
+    return cache_dir / f"{key}.json"
+
+
+def _load_replay_cache(
+    cache_path: Path,
+    receipt_digest: str,
+    receipt_path: Path,
+    root_dir: Path,
+    fingerprints: dict[str, list[int] | None],
+) -> dict[str, object] | None:
+    try:
+        entry = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get("report"), dict):
+        return None
+    if (
+        entry.get("version") != _REPLAY_CACHE_VERSION
+        or entry.get("contract_version") != CONTRACT_VERSION
+        or entry.get("receipt_digest") != receipt_digest
+        or entry.get("receipt_path") != receipt_path.as_posix()
+        or entry.get("root") != root_dir.as_posix()
+        or entry.get("fingerprints") != fingerprints
+    ):
+        return None
+    racy_after = entry.get("written_at_ns", 0) - _REPLAY_CACHE_RACY_NS
+    if any(fingerprint is not None and fingerprint[1] >= racy_after for fingerprint in fingerprints.values()):
+        return None
+    report = entry["report"]
+    report["hash_stats"] = {"files_hashed": 0, "reads_saved": 0}
+    report["cached"] = True
+    return report
+
+
+def _store_replay_cache(
+    cache_path: Path,
+    receipt_digest: str,
+    receipt_path: Path,
+    root_dir: Path,
+    fingerprints: dict[str, list[int] | None],
+    report: dict[str, object],
+) -> None:
+    entry = {
+        "version": _REPLAY_CACHE_VERSION,
+        "contract_version": CONTRACT_VERSION,
+        "receipt_digest": receipt_digest,
+        "receipt_path": receipt_path.as_posix(),
+        "root": root_dir.as_posix(),
+        "written_at_ns": time.time_ns(),
+        "fingerprints": fingerprints,
+        "report": report,
+    }
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    storage.write_bytes(cache_path, canonical_json_bytes(entry))
+
+
+def build_replay_report(
+    receipt_path: Path,
+    root_dir: Path,
+    *,
+    cache_dir: Path | None = None,
+    refresh: bool = False,
+) -> dict[str, object]:
+    receipt, receipt_digest, output_entries = _load_receipt_for_replay(receipt_path)
+    dataset_fixture = receipt.get("dataset_fixture") if isinstance(receipt, dict) else None
+    cache_path = _replay_cache_path(cache_dir, receipt, root_dir) if cache_dir is not None else None
+    if cache_path is not None:
+        fingerprints = _replay_fingerprints(root_dir, output_entries, dataset_fixture)
+        if not refresh:
+            cached = _load_replay_cache(cache_path, receipt_digest, receipt_path, root_dir, fingerprints)
+            if cached is not None:
+                return cached
+
+    schema_valid, schema_error = _validate_schema(receipt, "execution_receipt.schema.json")
+    receipt_hash_match = _validate_receipt_hash(receipt) if schema_valid else False
+    memo = _DigestMemo()
+    output_results = _verify_outputs(output_entries, root_dir, memo)
+    fixture_result = _verify_dataset_fixture(dataset_fixture, root_dir, memo)
+    report = _finalize_replay_report(
+        receipt_path.as_posix(),
+        root_dir.as_posix(),
+        schema_valid,
+        schema_error,
+        receipt_hash_match,
+        output_results,
+        fixture_result,
+        memo.stats(),
+    )
+    if cache_path is not None:
+        _store_replay_cache(cache_path, receipt_digest, receipt_path, root_dir, fingerprints, report)
+    if cache_dir is not None:
+        report["cached"] = False
+    return report
+
+
+def build_replay_partition(
+    receipt_path: Path,
+    root_dir: Path,
+    partition_index: int,
+    partition_count: int,
+) -> dict[str, object]:
+    if partition_count < 1 or not 0 <= partition_index < partition_count:
+        raise ValueError(f"invalid partition {partition_index}/{partition_count}")
+    receipt, receipt_digest, output_entries = _load_receipt_for_replay(receipt_path)
+    total = len(output_entries)
+    start = partition_index * total // partition_count
+    stop = (partition_index + 1) * total // partition_count
+
+    memo = _DigestMemo()
+    output_results = _verify_outputs(output_entries[start:stop], root_dir, memo)
+    schema_valid = None
+    schema_error = None
+    receipt_hash_match = None
+    fixture_result = None
+    if partition_index == 0:
+        schema_valid, schema_error = _validate_schema(receipt, "execution_receipt.schema.json")
+        receipt_hash_match = _validate_receipt_hash(receipt) if schema_valid else False
+        dataset_fixture = receipt.get("dataset_fixture") if isinstance(receipt, dict) else None
+        fixture_result = _verify_dataset_fixture(dataset_fixture, root_dir, memo)
+
+    return {
+        "contract_version": CONTRACT_VERSION,
+        "receipt_path": receipt_path.as_posix(),
+        "receipt_digest": receipt_digest,
+        "root": root_dir.as_posix(),
+        "partition": {"index": partition_index, "count": partition_count, "total_outputs": total},
+        "schema_valid": schema_valid,
+        "schema_error": schema_error,
+        "receipt_hash_match": receipt_hash_match,
+        "output_results": output_results,
+        "dataset_fixture_result": fixture_result,
+        "hash_stats": memo.stats(),
+    }
+
+
+def combine_replay_partitions(partitions: Sequence[dict[str, object]]) -> dict[str, object]:
+    if not partitions:
+        raise ValueError("no replay partitions to combine")
+    ordered = sorted(partitions, key=lambda item: item["partition"]["index"])
+    partition_count = ordered[0]["partition"]["count"]
+    indices = [partition["partition"]["index"] for partition in ordered]
+    if any(partition["partition"]["count"] != partition_count for partition in ordered) or indices != list(
+        range(partition_count)
+    ):
+        raise ValueError(f"expected exactly one partition per index 0..{partition_count - 1}, got {indices}")
+    for field in ("receipt_path", "receipt_digest", "root"):
+        values = {partition[field] for partition in ordered}
+        if len(values) != 1:
+            raise ValueError(f"replay partitions disagree on {field}: {sorted(values)}")
+
+    output_results: list[dict[str, object]] = []
+    for partition in ordered:
+        output_results.extend(partition["output_results"])
+    if len(output_results) != ordered[0]["partition"]["total_outputs"]:
+        raise ValueError("replay partitions do not cover every output")
+
+    hash_stats = {"files_hashed": 0, "reads_saved": 0}
+    for partition in ordered:
+        for key in hash_stats:
+            hash_stats[key] += partition.get("hash_stats", {}).get(key, 0)
+
+    first = ordered[0]
+    return _finalize_replay_report(
+        first["receipt_path"],
+        first["root"],
+        first["schema_valid"],
+        first["schema_error"],
+        first["receipt_hash_match"],
+        output_results,
+        first["dataset_fixture_result"],
+        hash_stats,
+    )
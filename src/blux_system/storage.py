@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import io
+import os
+import stat
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+FSYNC_POLICIES = ("none", "file", "dir")
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compression_for(path: str | Path) -> str | None:
+    suffix = Path(path).suffix
+    if suffix == ".gz":
+        return "gzip"
+    if suffix == ".zst":
+        return "zstd"
+    return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError("zstd compression requires the 'zstandard' package (pip install blux-system[zstd])") from exc
+    return zstandard
+
+
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+
+
+def _create_temp(target: Path) -> tuple[int, str]:
+    for _ in range(100):
+        name = str(target.parent / f".{target.name}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(name, _TEMP_FLAGS, 0o666), name
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"no unused temporary file name next to {target}")
+
+
+def _existing_mode(target: Path) -> int | None:
+    try:
+        return stat.S_IMODE(os.stat(target).st_mode)
+    except OSError:
+        return None
+
+
+def _fsync_directory(directory: Path) -> None:
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def open_atomic(
+    path: str | Path,
+    *,
+    fsync: str = "none",
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    compression: str | None = "auto",
+) -> Iterator[io.BufferedIOBase]:
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+    target = Path(path)
+    fd, temp_name = _create_temp(target)
+    try:
+        mode = _existing_mode(target)
+        if mode is not None:
+            os.chmod(temp_name, mode)
+        with open(fd, "wb", buffering=buffer_size) as raw:
+            if compression == "auto":
+                compression = compression_for(target)
+            if compression == "gzip":
+                import gzip
+
+                with gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as writer:
+                    yield writer
+            elif compression == "zstd":
+                with _zstandard().ZstdCompressor().stream_writer(raw, closefd=False) as writer:
+                    yield writer
+            else:
+                yield raw
+            raw.flush()
+            if fsync != "none":
+                os.fsync(raw.fileno())
+        os.replace(temp_name, target)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    if fsync == "dir":
+        _fsync_directory(target.parent)
+
+
+def write_bytes(
+    path: str | Path,
+    data: bytes,
+    *,
+    fsync: str = "none",
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> None:
+    with open_atomic(path, fsync=fsync, buffer_size=buffer_size) as handle:
+        handle.write(data)
+
+
+def compression_from_magic(magic: bytes) -> str | None:
+    if magic.startswith(_GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def detect_compression(path: str | Path) -> str | None:
+    with open(path, "rb") as handle:
+        return compression_from_magic(handle.read(4))
+
+
+def read_bytes(path: str | Path) -> bytes:
+    compression = detect_compression(path)
+    if compression == "gzip":
+        import gzip
+        import zlib
+
+        try:
+            with gzip.open(path, "rb") as handle:
+                return handle.read()
+        except (EOFError, zlib.error) as exc:
+            raise ValueError(f"{path} is not a valid gzip stream: {exc}") from exc
+    if compression == "zstd":
+        zstandard = _zstandard()
+        try:
+            with open(path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as handle:
+                return handle.read()
+        except zstandard.ZstdError as exc:
+            raise ValueError(f"{path} is not a valid zstd stream: {exc}") from exc
+    return Path(path).read_bytes()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+from blux_system.archive import ArchiveReader, is_archive
+from blux_system.core import CONTRACT_VERSION, compute_file_self_hash, compute_self_hash
+
+
+def _result(path: str, field: str | None, claimed: object, calculated: str | None) -> dict[str, object]:
+    return {
+        "path": path,
+        "field": field,
+        "hash": claimed if isinstance(claimed, str) else None,
+        "ok": calculated is not None and claimed == calculated,
+        "error": None,
+    }
+
+
+def _error(path: str, field: str | None, claimed: str | None, error: str) -> dict[str, object]:
+    return {"path": path, "field": field, "hash": claimed, "ok": False, "error": error}
+
+
+def _verify_record(reader: ArchiveReader, path: Path, ordinal: int) -> dict[str, object]:
+    try:
+        record = reader.record(ordinal)
+    except ValueError as exc:
+        return _error(f"{path.as_posix()}#{ordinal}", None, None, str(exc))
+    name = f"{path.as_posix()}#{record.name}"
+    try:
+        document = json.loads(reader.read_raw(record).decode("utf-8"))
+    except ValueError as exc:
+        return _error(name, record.field, record.hash, str(exc))
+    self_hash = compute_self_hash(document)
+    if self_hash is None or self_hash[0] != record.field or document[record.field] != record.hash:
+        return _result(name, record.field, record.hash, None)
+    return _result(name, record.field, record.hash, self_hash[1])
+
+
+def _verify_archive(path: Path, blocks: tuple[int, int] | None) -> list[dict[str, object]]:
+    with ArchiveReader(path) as reader:
+        ordinals = range(len(reader)) if blocks is None else reader.block_records(*blocks)
+        return [_verify_record(reader, path, ordinal) for ordinal in ordinals]
+
+
+def _verify_path(path_name: str, blocks: tuple[int, int] | None = None) -> list[dict[str, object]]:
+    try:
+        if blocks is not None or is_archive(path_name):
+            return _verify_archive(Path(path_name), blocks)
+        self_hash = compute_file_self_hash(path_name)
+    except (OSError, ValueError, RuntimeError) as exc:
+        return [_error(path_name, None, None, str(exc))]
+    if self_hash is None:
+        return [_error(path_name, None, None, "no report_hash, receipt_hash or snapshot_hash")]
+    return [_result(path_name, *self_hash)]
+
+
+def _verify_job(job: tuple[str, tuple[int, int] | None]) -> list[dict[str, object]]:
+    return _verify_path(*job)
+
+
+def _plan_jobs(path_name: str, pieces: int) -> list[tuple[str, tuple[int, int] | None]]:
+    try:
+        if pieces == 1 or not is_archive(path_name):
+            return [(path_name, None)]
+        with ArchiveReader(Path(path_name)) as reader:
+            block_count = reader.block_count
+    except (OSError, ValueError):
+        return [(path_name, None)]
+    step = max(1, -(-block_count // pieces))
+    return [(path_name, (start, min(start + step, block_count))) for start in range(0, block_count, step)]
+
+
+def verify_document_hashes(paths: Sequence[Path], *, workers: int | None = None) -> dict[str, object]:
+    requested = max(1, workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    jobs = [job for path in paths for job in _plan_jobs(Path(path).as_posix(), requested * 4)]
+    worker_count = max(1, min(requested, len(jobs)))
+    if worker_count == 1:
+        batches = [_verify_job(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(jobs) // (worker_count * 4))
+        with ProcessPoolExecutor(max_workers=worker_count) as executor:
+            batches = list(executor.map(_verify_job, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    documents = [result for batch in batches for result in batch]
+    errors = sum(1 for result in documents if result["error"] is not None)
+    mismatches = sum(1 for result in documents if result["error"] is None and not result["ok"])
+    return {
+        "contract_version": CONTRACT_VERSION,
+        "documents": documents,
+        "summary": {
+            "ok": bool(documents) and errors == 0 and mismatches == 0,
+            "total_documents": len(documents),
+            "verified": len(documents) - errors - mismatches,
+            "hash_mismatches": mismatches,
+            "errors": errors,
+        },
+        "throughput": {
+            "workers": worker_count,
+            "elapsed_seconds": round(elapsed, 6),
+            "documents_per_second": round(len(documents) / elapsed, 1) if elapsed > 0 else None,
+        },
+    }
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from blux_system.archive import ArchiveReader, pack_archive, query_archive, unpack_archive
+from blux_system.cli import main
+from blux_system.core import build_replay_report, canonical_json_bytes, make_receipt, make_snapshot, save_state
+
+
+def _write_documents(tmp_path: Path, count: int = 5) -> list[Path]:
+    paths = []
+    for index in range(count):
+        snapshot = make_snapshot(
+            inputs=[{"path": "inputs/a.txt", "hash": "sha256:aaa", "size": 1}],
+            outputs=[{"path": f"outputs/{index}.txt", "hash": f"sha256:{index}", "size": index}],
+        )
+        receipt = make_receipt(snapshot)
+        path = tmp_path / "runs" / f"run-{index}" / "receipt.json"
+        path.parent.mkdir(parents=True)
+        save_state(path, receipt)
+        paths.append(path)
+    report = build_replay_report(paths[0], tmp_path / "root")
+    save_state(paths[0].parent / "replay_report.json", report)
+    paths.append(paths[0].parent / "replay_report.json")
+    return paths
+
+
+def test_pack_unpack_round_trip(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "receipts.bxa"
+    records = pack_archive(paths, archive, block_size=256)
+
+    assert [record.name for record in records][:2] == ["run-0/receipt.json", "run-1/receipt.json"]
+    assert records[-1].field == "report_hash"
+    assert len({record.block for record in records}) > 1
+
+    written = unpack_archive(archive, tmp_path / "restored")
+    for original, restored in zip(paths, written):
+        assert restored.read_bytes() == original.read_bytes()
+
+
+def test_pack_is_deterministic(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    pack_archive(paths, tmp_path / "first.bxa")
+    pack_archive(paths, tmp_path / "second.bxa")
+
+    assert (tmp_path / "first.bxa").read_bytes() == (tmp_path / "second.bxa").read_bytes()
+
+
+def test_query_extracts_single_verified_receipt(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "receipts.bxa"
+    records = pack_archive(paths, archive, block_size=256)
+    target = records[3]
+
+    matches = query_archive(archive, target.hash)
+    assert [record.name for record, _ in matches] == [target.name]
+    assert matches[0][1] == paths[3].read_bytes()
+    assert query_archive(archive, "sha256:missing") == []
+
+    assert main(["query", "--archive", str(archive), "--hash", target.hash, "--out", str(tmp_path / "one.json")]) == 0
+    assert (tmp_path / "one.json").read_bytes() == paths[3].read_bytes()
+
+
+def test_tampered_record_fails_verification(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path, count=1)
+    archive = tmp_path / "receipts.bxa"
+    records = pack_archive(paths, archive, level=0)
+    original = paths[0].read_bytes()
+    tampered = original.replace(b'"sha256:0"', b'"sha256:9"')
+    archive.write_bytes(archive.read_bytes().replace(original, tampered))
+
+    with ArchiveReader(archive) as reader:
+        with pytest.raises(ValueError, match="corrupt"):
+            reader.read(records[0])
+
+
+def test_record_not_matching_index_fails_verification(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path, count=2)
+    archive = tmp_path / "receipts.bxa"
+    records = pack_archive(paths, archive)
+
+    with ArchiveReader(archive) as reader:
+        swapped = records[0]._replace(hash=records[1].hash)
+        with pytest.raises(ValueError, match="receipt_hash verification"):
+            reader.read(swapped)
+
+
+def test_pack_rejects_documents_without_valid_self_hash(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    path.write_bytes(canonical_json_bytes({"receipt_hash": "sha256:wrong"}))
+    with pytest.raises(ValueError, match="verification"):
+        pack_archive([path], tmp_path / "bad.bxa")
+
+    path.write_bytes(canonical_json_bytes({"a": 1}))
+    with pytest.raises(ValueError, match="no report_hash"):
+        pack_archive([path], tmp_path / "bad.bxa")
+    assert not (tmp_path / "bad.bxa").exists()
+
+
+def test_cli_pack_and_unpack(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "receipts.bxa"
+
+    assert main(["pack", "--out", str(archive), "--files", str(tmp_path / "runs" / "**" / "*.json")]) == 0
+    assert main(["unpack", "--archive", str(archive), "--out", str(tmp_path / "restored")]) == 0
+    for path in paths:
+        restored = tmp_path / "restored" / path.relative_to(tmp_path / "runs")
+        assert restored.read_bytes() == path.read_bytes()
+
+
+def test_find_bisects_the_hash_table(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path, count=200)
+    duplicate = tmp_path / "copies" / "receipt.json"
+    duplicate.parent.mkdir()
+    duplicate.write_bytes(paths[7].read_bytes())
+    archive = tmp_path / "receipts.bxa"
+    records = pack_archive([*paths, duplicate], archive, base=tmp_path)
+
+    probes = 0
+    digest_at = ArchiveReader._digest_at
+
+    def counting_digest_at(self: ArchiveReader, ordinal: int) -> bytes:
+        nonlocal probes
+        probes += 1
+        return digest_at(self, ordinal)
+
+    monkeypatch.setattr(ArchiveReader, "_digest_at", counting_digest_at)
+    with ArchiveReader(archive) as reader:
+        assert len(reader) == len(records)
+        assert reader.find(records[7].hash) == [records[7], records[-1]]
+        assert probes <= 12
+        assert reader.find(records[7].hash.upper()) == []
+        assert reader.find("sha256:abc") == []
+        assert reader.records == records
+
+
+def test_reader_rejects_other_archive_versions(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    archive = tmp_path / "receipts.bxa"
+    pack_archive(_write_documents(tmp_path, count=1), archive)
+    archive.write_bytes(b"BLUXARC\x01" + archive.read_bytes()[8:])
+
+    with pytest.raises(ValueError, match="unsupported archive version 1"):
+        ArchiveReader(archive)
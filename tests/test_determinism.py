@@ -3,6 +3,8 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import pytest
+
 from blux_system.core import build_receipt_from_snapshot, build_snapshot_from_dirs, canonical_json_bytes
 
 
@@ -201,3 +203,223 @@ def test_profile_fields_determinism(monkeypatch) -> None:
     assert canonical_json_bytes(make_receipt(snapshot_a, agent_headers=agent_headers)) == canonical_json_bytes(
         make_receipt(snapshot_b, agent_headers=agent_headers)
     )
+
+
+def test_bundle_spec_snapshot_matches_manual_bundles(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system.core import _hash_file, make_snapshot
+
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    input_dir.mkdir()
+    (output_dir / "reports").mkdir(parents=True)
+    (output_dir / "patches").mkdir()
+
+    (input_dir / "a.txt").write_text("alpha", encoding="utf-8")
+    (output_dir / "reports" / "one.json").write_text("{\"one\":1}", encoding="utf-8")
+    (output_dir / "reports" / "two.json").write_text("{\"two\":2}", encoding="utf-8")
+    (output_dir / "patches" / "a.patch").write_text("+alpha", encoding="utf-8")
+    (output_dir / "a.out").write_text("alpha+", encoding="utf-8")
+
+    def record(relative: str) -> dict[str, object]:
+        path = output_dir / relative
+        return {"path": relative, "hash": _hash_file(path), "size": path.stat().st_size}
+
+    spec = {
+        "output_bundles": {"reports": "reports", "first": ["reports/one.*"]},
+        "patch_bundles": {"patch-a": {"base_path": "a.txt", "patches": "patches/*.patch", "outputs": "a.out"}},
+    }
+    from_spec = build_snapshot_from_dirs(input_dir, output_dir, bundle_spec=spec)
+    manual = make_snapshot(
+        from_spec["inputs"],
+        from_spec["outputs"],
+        output_bundles=[
+            {"bundle_id": "reports", "files": [record("reports/one.json"), record("reports/two.json")]},
+            {"bundle_id": "first", "files": [record("reports/one.json")]},
+        ],
+        patch_bundles=[
+            {
+                "bundle_id": "patch-a",
+                "base_path": "a.txt",
+                "patches": [record("patches/a.patch")],
+                "outputs": [record("a.out")],
+            }
+        ],
+    )
+
+    assert canonical_json_bytes(from_spec) == canonical_json_bytes(manual)
+
+
+def test_bundle_spec_rejects_selectors_without_matches_and_unknown_fields(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    input_dir.mkdir()
+    (output_dir / "reports").mkdir(parents=True)
+    (output_dir / "reports" / "one.json").write_text("{\"one\":1}", encoding="utf-8")
+
+    overlapping = {"output_bundles": {"reports": ["reports", "reports/one.*"]}}
+    snapshot = build_snapshot_from_dirs(input_dir, output_dir, bundle_spec=overlapping)
+    assert [record["path"] for record in snapshot["output_bundles"][0]["files"]] == ["reports/one.json"]
+
+    with pytest.raises(ValueError, match="output_bundles.typo selector 'reprots' matches no output file"):
+        build_snapshot_from_dirs(input_dir, output_dir, bundle_spec={"output_bundles": {"typo": "reprots"}})
+    with pytest.raises(ValueError, match="patch_bundles.patch-a.outputs selector 'missing'"):
+        build_snapshot_from_dirs(
+            input_dir,
+            output_dir,
+            bundle_spec={
+                "patch_bundles": {"patch-a": {"base_path": "a.txt", "patches": "reports", "outputs": "missing"}}
+            },
+        )
+    with pytest.raises(ValueError, match=r"unknown fields in patch_bundles.patch-a: \['patchs'\]"):
+        build_snapshot_from_dirs(
+            input_dir,
+            output_dir,
+            bundle_spec={"patch_bundles": {"patch-a": {"base_path": "a.txt", "patchs": "reports"}}},
+        )
+
+
+def test_streamed_receipt_matches_receipt_dict(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system import core
+    from blux_system.core import make_snapshot, write_receipt_from_snapshot
+
+    monkeypatch.setattr(core, "_STREAM_RECEIPT_THRESHOLD", 0)
+
+    def records(prefix: str, count: int) -> list[dict[str, object]]:
+        return [
+            {"path": f"outputs/{prefix}-é-{index:05d}.txt", "hash": f"sha256:{prefix}{index % 7}", "size": index}
+            for index in range(count)
+        ]
+
+    snapshot = make_snapshot(
+        inputs=records("in", 50),
+        outputs=records("a", 3000),
+        output_bundles=[
+            {"bundle_id": "bundle-b", "files": records("a", 1000)},
+            {"bundle_id": "bundle-a", "files": records("b", 2000)},
+        ],
+        patch_bundles=[
+            {
+                "bundle_id": "patch-a",
+                "base_path": "inputs/a.txt",
+                "patches": records("b", 10) + [{"path": "outputs/a-é-00001.txt", "hash": "sha256:0", "size": 1}],
+                "outputs": records("c", 500),
+            }
+        ],
+    )
+    snapshot_path = tmp_path / "snapshot.json"
+    snapshot_path.write_bytes(canonical_json_bytes(snapshot))
+    receipt_path = tmp_path / "receipt.json"
+
+    receipt_hash = write_receipt_from_snapshot(snapshot_path, receipt_path)
+    receipt = build_receipt_from_snapshot(snapshot_path)
+
+    assert receipt_hash == receipt["receipt_hash"]
+    assert receipt_path.read_bytes() == canonical_json_bytes(receipt)
+
+
+def test_streamed_receipt_falls_back_for_unsorted_snapshot(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system import core
+    from blux_system.core import write_receipt_from_snapshot
+
+    monkeypatch.setattr(core, "_STREAM_RECEIPT_THRESHOLD", 0)
+    snapshot = {
+        "contract_version": "1.0",
+        "created_at": "2024-01-01T00:00:00Z",
+        "inputs": [],
+        "outputs": [
+            {"path": "outputs/b.txt", "hash": "sha256:bbb", "size": 1},
+            {"path": "outputs/a.txt", "hash": "sha256:aaa", "size": 1},
+        ],
+        "output_bundles": [],
+        "patch_bundles": [],
+        "snapshot_hash": "sha256:snapshot",
+    }
+    snapshot_path = tmp_path / "snapshot.json"
+    snapshot_path.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+    receipt_path = tmp_path / "receipt.json"
+
+    write_receipt_from_snapshot(snapshot_path, receipt_path)
+
+    assert receipt_path.read_bytes() == canonical_json_bytes(build_receipt_from_snapshot(snapshot_path))
+
+
+def _many_bundle_snapshot(tmp_path: Path, count: int) -> Path:
+    from blux_system.core import make_snapshot
+
+    records = [
+        {"path": f"outputs/{index:06d}.txt", "hash": f"sha256:{index:064x}", "size": index} for index in range(count)
+    ]
+    bundles = [{"bundle_id": f"bundle-{index:06d}", "files": [record]} for index, record in enumerate(records)]
+    snapshot = make_snapshot([], records, output_bundles=bundles)
+    snapshot_path = tmp_path / "snapshot.json"
+    snapshot_path.write_bytes(canonical_json_bytes(snapshot))
+    return snapshot_path
+
+
+def test_streamed_receipt_memory_does_not_grow_with_section_count(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    import tracemalloc
+
+    from blux_system import core
+    from blux_system.core import write_receipt_from_snapshot
+
+    monkeypatch.setattr(core, "_STREAM_RECEIPT_THRESHOLD", 0)
+    snapshot_path = _many_bundle_snapshot(tmp_path, 5000)
+    receipt_path = tmp_path / "receipt.json"
+
+    tracemalloc.start()
+    try:
+        write_receipt_from_snapshot(snapshot_path, receipt_path)
+        _, streamed_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        receipt = build_receipt_from_snapshot(snapshot_path)
+        _, loaded_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert receipt_path.read_bytes() == canonical_json_bytes(receipt)
+    assert streamed_peak < 8 * 1024 * 1024
+    assert streamed_peak < loaded_peak / 2
+
+
+def test_streamed_receipt_merges_in_stages(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system import core
+
+    monkeypatch.setattr(core, "_MERGE_FAN_IN", 3)
+    monkeypatch.setattr(core, "_STREAM_RECEIPT_THRESHOLD", 0)
+    snapshot_path = _many_bundle_snapshot(tmp_path, 40)
+    receipt_path = tmp_path / "receipt.json"
+
+    receipt_hash = core.write_receipt_from_snapshot(snapshot_path, receipt_path)
+
+    assert receipt_hash == build_receipt_from_snapshot(snapshot_path)["receipt_hash"]
+    assert receipt_path.read_bytes() == canonical_json_bytes(build_receipt_from_snapshot(snapshot_path))
+
+
+def test_small_snapshot_receipt_is_built_in_memory(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system import core
+
+    def fail_scan(reader: object) -> None:
+        raise AssertionError("small snapshots should not be scanned")
+
+    monkeypatch.setattr(core, "_scan_snapshot", fail_scan)
+    snapshot_path = _many_bundle_snapshot(tmp_path, 10)
+    receipt_path = tmp_path / "receipt.json"
+
+    receipt_hash = core.write_receipt_from_snapshot(snapshot_path, receipt_path)
+
+    assert receipt_path.read_bytes() == canonical_json_bytes(build_receipt_from_snapshot(snapshot_path))
+    assert receipt_hash == build_receipt_from_snapshot(snapshot_path)["receipt_hash"]
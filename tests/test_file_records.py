@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import copy
+import json
+import os
+import pickle
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from blux_system.core import (
+    FileRecord,
+    FileRecordTable,
+    _collect_files,
+    _DigestMemo,
+    build_snapshot_from_dirs,
+    canonical_json_bytes,
+    make_snapshot,
+    write_snapshot_from_dirs,
+)
+
+
+def test_file_record_table_round_trips_and_sorts() -> None:
+    records = [
+        {"path": "outputs/b.txt", "hash": "sha256:" + "ab" * 32, "size": 3},
+        {"path": "outputs/a.txt", "hash": "sha256:zzz", "size": 1},
+        {"path": "outputs/ä.txt", "hash": "sha256:" + "0f" * 32, "size": 2**70},
+        {"path": "outputs/a.txt", "hash": "sha256:aaa", "size": 2},
+    ]
+    table = FileRecordTable.from_records(records)
+    table.sort()
+
+    expected = sorted(records, key=lambda item: item["path"])
+    assert list(table.as_dicts()) == expected
+    assert table.canonical_json_bytes() == canonical_json_bytes(expected)
+    assert table[0].hash == "sha256:zzz"
+    assert table[-1].size == 2**70
+
+    table.sort(by_hash=True)
+    assert [record.hash for record in table][:2] == ["sha256:aaa", "sha256:zzz"]
+
+
+def test_streamed_snapshot_matches_snapshot_dict(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    (input_dir / "nested").mkdir(parents=True)
+    (output_dir / "reports").mkdir(parents=True)
+    (input_dir / "nested" / "alpha.txt").write_text("alpha", encoding="utf-8")
+    (input_dir / "beta.txt").write_text("beta", encoding="utf-8")
+    (output_dir / "reports" / "résumé.json").write_text("{\"ok\":true}", encoding="utf-8")
+    (output_dir / "result.json").write_text("{\"ok\":false}", encoding="utf-8")
+
+    spec = {"output_bundles": {"reports": "reports"}}
+    destination = tmp_path / "snapshot.json"
+    snapshot_hash = write_snapshot_from_dirs(input_dir, output_dir, destination, bundle_spec=spec)
+    snapshot = build_snapshot_from_dirs(input_dir, output_dir, bundle_spec=spec)
+
+    assert snapshot_hash == snapshot["snapshot_hash"]
+    assert destination.read_bytes() == canonical_json_bytes(snapshot)
+    assert json.loads(destination.read_text(encoding="utf-8")) == snapshot
+
+
+def test_make_snapshot_leaves_caller_table_and_views_intact() -> None:
+    table = FileRecordTable.from_records(
+        [
+            {"path": "outputs/b.txt", "hash": "sha256:" + "bb" * 32, "size": 2},
+            {"path": "outputs/a.txt", "hash": "sha256:" + "aa" * 32, "size": 1},
+        ]
+    )
+    first = table[0]
+    snapshot = make_snapshot([], table)
+
+    assert [record["path"] for record in snapshot["outputs"]] == ["outputs/a.txt", "outputs/b.txt"]
+    assert first.path == "outputs/b.txt"
+    assert first.size == 2
+
+
+def test_collection_memoizes_only_hardlinked_files(tmp_path: Path) -> None:
+    for index in range(2000):
+        (tmp_path / f"d{index % 20}").mkdir(exist_ok=True)
+        (tmp_path / f"d{index % 20}" / f"f{index}.txt").write_text(str(index), encoding="utf-8")
+    os.link(tmp_path / "d0" / "f0.txt", tmp_path / "linked.txt")
+
+    memo = _DigestMemo(shared_only=True)
+    tracemalloc.start()
+    try:
+        table = _collect_files(tmp_path, memo)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(table) == 2001
+    assert len(memo._by_path) == 0
+    assert len(memo._by_identity) == 1
+    assert memo.stats() == {"files_hashed": 2000, "reads_saved": 1}
+    assert retained / len(table) < 200
+    assert peak / len(table) < 300
+
+
+def test_file_record_is_a_frozen_value_object() -> None:
+    record = FileRecord(path="outputs/a.txt", hash="sha256:aaa", size=1)
+
+    assert record == FileRecord("outputs/a.txt", "sha256:aaa", 1)
+    assert record != ("outputs/a.txt", "sha256:aaa", 1)
+    assert hash(record) == hash(FileRecord("outputs/a.txt", "sha256:aaa", 1))
+    assert repr(record) == "FileRecord(path='outputs/a.txt', hash='sha256:aaa', size=1)"
+    with pytest.raises(AttributeError):
+        record.size = 2
+    with pytest.raises(TypeError):
+        tuple(record)
+    with pytest.raises(TypeError):
+        canonical_json_bytes(record)
+
+
+def test_file_record_pickles_and_copies() -> None:
+    record = FileRecord("outputs/a.txt", "sha256:aaa", 1)
+
+    for restored in (pickle.loads(pickle.dumps(record)), copy.copy(record), copy.deepcopy(record)):
+        assert restored == record
+        assert type(restored) is FileRecord
+        with pytest.raises(AttributeError):
+            restored.path = "other"
+
+
+def test_collection_skips_missing_roots_and_unreadable_directories(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot = build_snapshot_from_dirs(tmp_path / "missing", tmp_path / "missing")
+    assert snapshot["inputs"] == [] and snapshot["outputs"] == []
+
+    (tmp_path / "tree" / "locked").mkdir(parents=True)
+    (tmp_path / "tree" / "locked" / "secret.txt").write_text("x", encoding="utf-8")
+    (tmp_path / "tree" / "open.txt").write_text("y", encoding="utf-8")
+    locked = str(tmp_path / "tree" / "locked")
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if str(path) == locked:
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", guarded_scandir)
+    assert [record.path for record in _collect_files(tmp_path / "tree")] == ["open.txt"]
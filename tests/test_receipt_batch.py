@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from blux_system.cli import main
+from blux_system.core import (
+    build_receipt_from_snapshot,
+    canonical_json_bytes,
+    make_receipts,
+    make_snapshot,
+)
+
+
+def _write_snapshots(tmp_path: Path) -> list[Path]:
+    paths = []
+    for index in range(3):
+        snapshot = make_snapshot(
+            inputs=[{"path": "inputs/a.txt", "hash": "sha256:aaa", "size": 1}],
+            outputs=[{"path": f"outputs/{index}.txt", "hash": f"sha256:{index}", "size": index}],
+        )
+        path = tmp_path / "runs" / f"run-{index}" / "snapshot.json"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(canonical_json_bytes(snapshot))
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_make_receipts_matches_single_receipts(tmp_path: Path, monkeypatch, workers: int) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot_paths = _write_snapshots(tmp_path)
+
+    results = make_receipts(snapshot_paths, workers=workers)
+
+    for snapshot_path, result in zip(snapshot_paths, results):
+        expected = build_receipt_from_snapshot(snapshot_path)
+        receipt_path = snapshot_path.parent / "receipt.json"
+        assert result["receipt"] == receipt_path.as_posix()
+        assert result["receipt_hash"] == expected["receipt_hash"]
+        assert receipt_path.read_bytes() == canonical_json_bytes(expected)
+
+
+def test_make_receipts_mirrors_output_tree(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot_paths = _write_snapshots(tmp_path)
+
+    results = make_receipts(snapshot_paths, output_dir=tmp_path / "receipts", workers=1)
+
+    assert [Path(result["receipt"]) for result in results] == [
+        tmp_path / "receipts" / f"run-{index}" / "receipt.json" for index in range(3)
+    ]
+    assert all(Path(result["receipt"]).exists() for result in results)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_make_receipts_reports_bad_snapshot_and_continues(tmp_path: Path, monkeypatch, workers: int) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot_paths = _write_snapshots(tmp_path)
+    snapshot_paths[1].write_text("{", encoding="utf-8")
+
+    results = make_receipts(snapshot_paths, workers=workers)
+
+    assert [result["error"] is None for result in results] == [True, False, True]
+    assert results[1]["receipt_hash"] is None
+    assert "JSONDecodeError" in results[1]["error"]
+    assert Path(results[0]["receipt"]).exists()
+    assert Path(results[2]["receipt"]).exists()
+    assert not Path(results[1]["receipt"]).exists()
+
+
+def test_receipt_batch_cli_exit_status(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot_paths = _write_snapshots(tmp_path)
+    snapshot_paths[1].write_text("{", encoding="utf-8")
+    pattern = str(tmp_path / "runs" / "*" / "snapshot.json")
+
+    assert main(["receipt-batch", "--snapshots", pattern, "--workers", "1"]) == 1
+    captured = capsys.readouterr()
+    assert "2/3 receipts written, 1 failed" in captured.out
+    assert snapshot_paths[1].as_posix() in captured.err
+
+    with pytest.raises(SystemExit) as excinfo:
+        main(["receipt-batch", "--snapshots", str(tmp_path / "nomatch" / "*.json")])
+    assert excinfo.value.code == 2
+    assert "no files match" in capsys.readouterr().err
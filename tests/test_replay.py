@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
 from blux_system.core import (
+    build_replay_partition,
     build_replay_report,
     build_snapshot_from_dirs,
     canonical_json_bytes,
+    combine_replay_partitions,
     make_receipt,
 )
 
@@ -92,3 +95,118 @@ def test_replay_dataset_fixture_verification(tmp_path: Path, monkeypatch) -> Non
 
     assert report["summary"]["ok"] is False
     assert report["summary"]["fixture_hash_mismatches"] == 1
+
+
+def test_partitioned_replay_matches_single_run(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    input_dir.mkdir()
+    output_dir.mkdir()
+
+    (input_dir / "alpha.txt").write_text("alpha", encoding="utf-8")
+    for index in range(7):
+        (output_dir / f"result-{index}.json").write_text(f"{{\"index\":{index}}}", encoding="utf-8")
+
+    snapshot = build_snapshot_from_dirs(input_dir, output_dir)
+    receipt = make_receipt(snapshot)
+    receipt_path = tmp_path / "receipt.json"
+    receipt_path.write_text(json.dumps(receipt), encoding="utf-8")
+
+    (output_dir / "result-2.json").write_text("{\"index\":-1}", encoding="utf-8")
+    (output_dir / "result-5.json").unlink()
+
+    partitions = [build_replay_partition(receipt_path, output_dir, index, 3) for index in range(3)]
+    combined = combine_replay_partitions(list(reversed(partitions)))
+    report = build_replay_report(receipt_path, output_dir)
+
+    assert combined["summary"]["hash_mismatches"] == 1
+    assert combined["summary"]["missing_outputs"] == 1
+    assert combined["report_hash"] == report["report_hash"]
+    assert canonical_json_bytes(combined) == canonical_json_bytes(report)
+
+
+def test_replay_hashes_each_physical_file_once(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system.core import make_snapshot
+
+    output_dir = tmp_path / "outputs"
+    output_dir.mkdir()
+    (output_dir / "a.txt").write_text("shared", encoding="utf-8")
+    os.link(output_dir / "a.txt", output_dir / "b.txt")
+
+    snapshot = build_snapshot_from_dirs(tmp_path / "outputs", output_dir)
+    records = snapshot["outputs"]
+    snapshot = make_snapshot(
+        [],
+        records,
+        output_bundles=[{"bundle_id": "bundle-a", "files": records}],
+        patch_bundles=[{"bundle_id": "patch-a", "base_path": "a.txt", "patches": [], "outputs": records}],
+    )
+    receipt = make_receipt(snapshot)
+    receipt_path = tmp_path / "receipt.json"
+    receipt_path.write_text(json.dumps(receipt), encoding="utf-8")
+
+    report = build_replay_report(receipt_path, output_dir)
+
+    assert report["summary"]["ok"] is True
+    assert report["summary"]["total_outputs"] == 6
+    assert report["hash_stats"] == {"files_hashed": 1, "reads_saved": 5}
+
+
+def test_replay_cache_reuses_verdict_until_files_change(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    cache_dir = tmp_path / "cache"
+    input_dir.mkdir()
+    output_dir.mkdir()
+
+    (input_dir / "alpha.txt").write_text("alpha", encoding="utf-8")
+    output_file = output_dir / "result.json"
+    output_file.write_text("{\"ok\":true}", encoding="utf-8")
+    os.utime(output_file, ns=(1_000_000_000, 1_000_000_000))
+
+    snapshot = build_snapshot_from_dirs(input_dir, output_dir)
+    receipt = make_receipt(snapshot)
+    receipt_path = tmp_path / "receipt.json"
+    receipt_path.write_text(json.dumps(receipt), encoding="utf-8")
+
+    first = build_replay_report(receipt_path, output_dir, cache_dir=cache_dir)
+    second = build_replay_report(receipt_path, output_dir, cache_dir=cache_dir)
+    forced = build_replay_report(receipt_path, output_dir, cache_dir=cache_dir, refresh=True)
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert forced["cached"] is False
+    assert second["report_hash"] == first["report_hash"]
+    assert second["summary"]["ok"] is True
+
+    output_file.write_text("{\"ok\":false}", encoding="utf-8")
+    os.utime(output_file, ns=(2_000_000_000, 2_000_000_000))
+    changed = build_replay_report(receipt_path, output_dir, cache_dir=cache_dir)
+
+    assert changed["cached"] is False
+    assert changed["summary"]["hash_mismatches"] == 1
+
+
+def test_replay_cache_skipped_when_root_is_missing(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+
+    from blux_system.core import make_snapshot
+
+    snapshot = make_snapshot([], [{"path": "result.json", "hash": "sha256:aaa", "size": 1}])
+    receipt_path = tmp_path / "receipt.json"
+    receipt_path.write_text(json.dumps(make_receipt(snapshot)), encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    report = build_replay_report(receipt_path, tmp_path / "missing", cache_dir=cache_dir)
+    uncached = build_replay_report(receipt_path, tmp_path / "missing")
+
+    assert report["cached"] is False
+    assert report["summary"]["missing_outputs"] == 1
+    assert report["report_hash"] == uncached["report_hash"]
+    assert not cache_dir.exists()
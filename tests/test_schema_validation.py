@@ -4,8 +4,9 @@ import json
 from pathlib import Path
 
 import jsonschema
+import pytest
 
-from blux_system.core import build_replay_report, make_receipt, make_snapshot
+from blux_system.core import build_replay_partition, build_replay_report, make_receipt, make_snapshot
 
 ROOT = Path(__file__).resolve().parents[1]
 SCHEMA_DIR = ROOT / "schemas"
@@ -95,3 +96,31 @@ def test_replay_report_schema_validation(tmp_path: Path) -> None:
     report = build_replay_report(receipt_path, tmp_path)
     schema = load_schema("replay_report.schema.json")
     jsonschema.validate(report, schema)
+
+
+def test_replay_partition_schema_validation(tmp_path: Path) -> None:
+    snapshot = make_snapshot(
+        inputs=[{"path": "inputs/alpha.txt", "hash": "sha256:aaa", "size": 5}],
+        outputs=[{"path": "outputs/result.json", "hash": "sha256:bbb", "size": 11}],
+        created_at="2024-01-01T00:00:00Z",
+    )
+    receipt = make_receipt(snapshot, created_at="2024-01-01T00:00:00Z")
+    receipt_path = tmp_path / "receipt.json"
+    receipt_path.write_text(json.dumps(receipt), encoding="utf-8")
+
+    schema = load_schema("replay_partition.schema.json")
+    for index in range(2):
+        jsonschema.validate(build_replay_partition(receipt_path, tmp_path, index, 2), schema)
+
+
+def test_bundle_spec_schema_validation() -> None:
+    schema = load_schema("bundle_spec.schema.json")
+    spec = {
+        "output_bundles": {"reports": "reports", "logs": ["logs/*.txt", "summary.json"]},
+        "patch_bundles": {"patch-a": {"base_path": "inputs/a.txt", "patches": "patches/*.patch", "outputs": "patched"}},
+    }
+    jsonschema.validate(spec, schema)
+
+    spec["patch_bundles"]["patch-a"]["patchs"] = "patches/*.patch"
+    with pytest.raises(jsonschema.ValidationError):
+        jsonschema.validate(spec, schema)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import jsonschema
+import pytest
+
+from blux_system.core import (
+    build_snapshot_from_dirs,
+    canonical_json_bytes,
+    make_snapshot_shard,
+    merge_snapshot_shards,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+SCHEMA_DIR = ROOT / "schemas"
+
+
+def _populate(tmp_path: Path) -> tuple[Path, Path]:
+    input_dir = tmp_path / "inputs"
+    output_dir = tmp_path / "outputs"
+    for name in ("alpha", "beta", "gamma", "delta"):
+        (input_dir / name).mkdir(parents=True)
+        (input_dir / name / "data.txt").write_text(name, encoding="utf-8")
+        (output_dir / name / "nested").mkdir(parents=True)
+        (output_dir / name / "nested" / "result.json").write_text(f"{{\"{name}\":true}}", encoding="utf-8")
+    (input_dir / "top.txt").write_text("top", encoding="utf-8")
+    (output_dir / "summary.json").write_text("{\"ok\":true}", encoding="utf-8")
+    return input_dir, output_dir
+
+
+def test_merged_shards_match_whole_snapshot(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    input_dir, output_dir = _populate(tmp_path)
+
+    shards = [make_snapshot_shard(input_dir, output_dir, index, 3) for index in range(3)]
+    schema = json.loads((SCHEMA_DIR / "snapshot_shard.schema.json").read_text(encoding="utf-8"))
+    for shard in shards:
+        jsonschema.validate(shard, schema)
+
+    whole = build_snapshot_from_dirs(input_dir, output_dir)
+    merged = merge_snapshot_shards(list(reversed(shards)))
+
+    assert merged["snapshot_hash"] == whole["snapshot_hash"]
+    assert canonical_json_bytes(merged) == canonical_json_bytes(whole)
+
+
+def test_merge_rejects_incomplete_shard_set(tmp_path: Path) -> None:
+    input_dir, output_dir = _populate(tmp_path)
+    shards = [make_snapshot_shard(input_dir, output_dir, index, 3) for index in (0, 2)]
+
+    with pytest.raises(ValueError):
+        merge_snapshot_shards(shards)
+
+
+def test_merge_rejects_shards_from_different_captures(tmp_path: Path) -> None:
+    input_dir, output_dir = _populate(tmp_path)
+    first = [make_snapshot_shard(input_dir, output_dir, index, 2, run_id="run-1") for index in range(2)]
+    second = [make_snapshot_shard(input_dir, output_dir, index, 2, run_id="run-2") for index in range(2)]
+    with pytest.raises(ValueError, match="run_id"):
+        merge_snapshot_shards([first[0], second[1]])
+
+    (output_dir / "late.txt").write_text("late", encoding="utf-8")
+    late = make_snapshot_shard(input_dir, output_dir, 1, 2, run_id="run-1")
+    with pytest.raises(ValueError, match="output_entries"):
+        merge_snapshot_shards([first[0], late])
+
+    other_input, other_output = _populate(tmp_path / "other")
+    other = make_snapshot_shard(other_input, other_output, 1, 2, run_id="run-1")
+    with pytest.raises(ValueError, match="input_root"):
+        merge_snapshot_shards([first[0], other])
+
+
+def test_shard_of_missing_roots_is_empty(tmp_path: Path) -> None:
+    shard = make_snapshot_shard(tmp_path / "missing", tmp_path / "missing", 0, 2)
+
+    assert shard["inputs"] == [] and shard["outputs"] == []
+    assert shard["capture"]["input_entries"] == "sha256:" + hashlib.sha256(b"[]").hexdigest()
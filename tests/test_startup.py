@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ("jsonschema", "dataclasses", "inspect", "tempfile", "typing", "datetime")
+
+
+def _imported_modules(statement: str, *names: str) -> list[str]:
+    probe = f"import sys; {statement}; print(' '.join(m for m in sys.argv[1:] if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", probe, *names],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.split()
+
+
+def test_cli_import_stays_lightweight() -> None:
+    assert _imported_modules("import blux_system.cli", *HEAVY_MODULES) == []
+
+
+def test_package_import_is_lazy() -> None:
+    assert _imported_modules("import blux_system", "blux_system.core") == []
+    assert _imported_modules("from blux_system import make_receipt", "blux_system.core") == ["blux_system.core"]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import gzip
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from blux_system import storage
+from blux_system.core import (
+    canonical_json_bytes,
+    load_state,
+    make_snapshot,
+    save_state,
+    write_receipt_from_snapshot,
+)
+
+
+def _snapshot() -> dict[str, object]:
+    return make_snapshot(
+        inputs=[{"path": "inputs/a.txt", "hash": "sha256:aaa", "size": 1}],
+        outputs=[{"path": "outputs/b.txt", "hash": "sha256:bbb", "size": 2}],
+    )
+
+
+@pytest.mark.parametrize("fsync", storage.FSYNC_POLICIES)
+def test_save_state_is_atomic_and_leaves_no_temp_files(tmp_path: Path, fsync: str) -> None:
+    path = tmp_path / "state.json"
+    save_state(path, {"b": 1, "a": [1, 2]}, fsync=fsync)
+
+    assert path.read_bytes() == b'{"a":[1,2],"b":1}'
+    assert [child.name for child in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_failed_write_keeps_previous_file(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    save_state(path, {"a": 1})
+
+    with pytest.raises(RuntimeError):
+        with storage.open_atomic(path) as handle:
+            handle.write(b'{"a":')
+            raise RuntimeError("interrupted")
+
+    assert load_state(path) == {"a": 1}
+    assert [child.name for child in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_invalid_fsync_policy_is_rejected(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        save_state(tmp_path / "state.json", {}, fsync="always")
+
+
+def test_gzip_state_round_trips_deterministically(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot = _snapshot()
+    first = tmp_path / "first.json.gz"
+    second = tmp_path / "second.json.gz"
+    save_state(first, snapshot)
+    save_state(second, snapshot)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert gzip.decompress(first.read_bytes()) == canonical_json_bytes(snapshot)
+    assert load_state(first) == snapshot
+
+
+def test_receipt_from_compressed_snapshot_matches_plain(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    snapshot = _snapshot()
+    save_state(tmp_path / "snapshot.json", snapshot)
+    save_state(tmp_path / "snapshot.json.gz", snapshot)
+
+    plain_hash = write_receipt_from_snapshot(tmp_path / "snapshot.json", tmp_path / "plain.json")
+    packed_hash = write_receipt_from_snapshot(
+        tmp_path / "snapshot.json.gz", tmp_path / "packed.json.gz", fsync="file"
+    )
+
+    assert plain_hash == packed_hash
+    assert load_state(tmp_path / "packed.json.gz") == load_state(tmp_path / "plain.json")
+
+
+def test_zstd_state_round_trips(tmp_path: Path) -> None:
+    pytest.importorskip("zstandard")
+    path = tmp_path / "state.json.zst"
+    save_state(path, {"a": 1})
+
+    assert storage.detect_compression(path) == "zstd"
+    assert load_state(path) == {"a": 1}
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_written_files_honour_umask_and_keep_existing_mode(tmp_path: Path) -> None:
+    previous = os.umask(0o022)
+    try:
+        path = tmp_path / "state.json"
+        save_state(path, {"a": 1})
+        reference = tmp_path / "reference.json"
+        reference.write_bytes(b"{}")
+        assert stat.S_IMODE(path.stat().st_mode) == stat.S_IMODE(reference.stat().st_mode) == 0o644
+
+        os.umask(0o077)
+        save_state(path, {"a": 2})
+        assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+        os.chmod(path, 0o640)
+        save_state(path, {"a": 3})
+        assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+        fresh = tmp_path / "fresh.json"
+        save_state(fresh, {"a": 1})
+        assert stat.S_IMODE(fresh.stat().st_mode) == 0o600
+    finally:
+        os.umask(previous)
+
+
+def test_atomic_write_leaves_the_process_umask_alone(tmp_path: Path, monkeypatch) -> None:
+    def fail_umask(mask: int) -> int:
+        raise AssertionError("open_atomic must not change the process umask")
+
+    monkeypatch.setattr(os, "umask", fail_umask)
+    save_state(tmp_path / "fresh.json", {"a": 1})
+    save_state(tmp_path / "fresh.json", {"a": 2})
+
+    assert load_state(tmp_path / "fresh.json") == {"a": 2}
+    assert [path.name for path in tmp_path.iterdir()] == ["fresh.json"]
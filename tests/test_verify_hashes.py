@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+import jsonschema
+import pytest
+
+from blux_system import core
+from blux_system.archive import pack_archive
+from blux_system.cli import main
+from blux_system.core import (
+    build_replay_report,
+    canonical_json_bytes,
+    compute_file_self_hash,
+    compute_self_hash,
+    make_receipt,
+    make_snapshot,
+    save_state,
+)
+from blux_system.verify import verify_document_hashes
+
+SCHEMA = Path(__file__).resolve().parents[1] / "schemas" / "hash_verification.schema.json"
+
+
+def _write_documents(tmp_path: Path) -> list[Path]:
+    snapshot = make_snapshot(
+        inputs=[{"path": "inputs/a.txt", "hash": "sha256:aaa", "size": 1}],
+        outputs=[{"path": f"outputs/{index}.txt", "hash": f"sha256:{index}", "size": index} for index in range(4)],
+    )
+    receipt = make_receipt(snapshot)
+    paths = [tmp_path / "snapshot.json", tmp_path / "receipt.json", tmp_path / "replay_report.json"]
+    save_state(paths[0], snapshot)
+    save_state(paths[1], receipt)
+    report = build_replay_report(paths[1], tmp_path / "root")
+    save_state(paths[2], report)
+    return paths
+
+
+def test_stream_self_hash_matches_full_parse(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    for path in _write_documents(tmp_path):
+        document = json.loads(path.read_text(encoding="utf-8"))
+        field, calculated = compute_self_hash(document)
+        assert core._stream_self_hash(io.BytesIO(path.read_bytes())) == (field, document[field], calculated)
+        assert calculated == document[field]
+
+
+def test_compute_file_self_hash_falls_back_for_non_canonical_files(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    monkeypatch.setattr(core, "_STREAM_HASH_THRESHOLD", 0)
+    receipt_path = _write_documents(tmp_path)[1]
+    receipt = json.loads(receipt_path.read_text(encoding="utf-8"))
+    pretty = tmp_path / "pretty.json"
+    pretty.write_text(json.dumps(dict(reversed(list(receipt.items()))), indent=2), encoding="utf-8")
+
+    assert compute_file_self_hash(pretty) == compute_file_self_hash(receipt_path)
+    assert compute_file_self_hash(receipt_path)[1:] == (receipt["receipt_hash"], receipt["receipt_hash"])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_document_hashes_reports_each_document(tmp_path: Path, monkeypatch, workers: int) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    tampered = tmp_path / "tampered.json"
+    tampered.write_bytes(paths[1].read_bytes().replace(b'"sha256:1"', b'"sha256:9"'))
+    unhashed = tmp_path / "state.json"
+    unhashed.write_bytes(canonical_json_bytes({"a": 1}))
+
+    report = verify_document_hashes([*paths, tampered, unhashed], workers=workers)
+
+    jsonschema.validate(report, json.loads(SCHEMA.read_text(encoding="utf-8")))
+    assert [(result["field"], result["ok"]) for result in report["documents"]] == [
+        ("snapshot_hash", True),
+        ("receipt_hash", True),
+        ("report_hash", True),
+        ("receipt_hash", False),
+        (None, False),
+    ]
+    assert report["summary"] == {
+        "ok": False,
+        "total_documents": 5,
+        "verified": 3,
+        "hash_mismatches": 1,
+        "errors": 1,
+    }
+    assert report["throughput"]["workers"] == workers
+
+
+def test_verify_hashes_reads_archives(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "history.bxa"
+    pack_archive(paths, archive)
+
+    report = verify_document_hashes([archive])
+
+    assert [result["path"] for result in report["documents"]] == [
+        f"{archive.as_posix()}#{path.name}" for path in paths
+    ]
+    assert report["summary"]["ok"] is True
+
+
+def test_cli_verify_hashes_exit_status(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    _write_documents(tmp_path)
+    out = tmp_path / "verification.json"
+
+    assert main(["verify-hashes", "--files", str(tmp_path / "*.json"), "--workers", "1", "--out", str(out)]) == 0
+    assert "3/3 documents verified" in capsys.readouterr().out
+    assert json.loads(out.read_text(encoding="utf-8"))["summary"]["ok"] is True
+
+    (tmp_path / "receipt.json").write_bytes(b"{")
+    assert main(["verify-hashes", "--files", str(tmp_path / "*.json"), "--workers", "1"]) == 1
+
+
+def test_verify_hashes_reports_corrupt_archives_as_errors(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "history.bxa"
+    pack_archive(paths, archive, block_size=1, level=0)
+    data = archive.read_bytes()
+    records_offset = struct.unpack_from("<QQQQQ8s", data, len(data) - 48)[3]
+    bad_field = bytearray(data)
+    bad_field[records_offset + 32] = 9
+    (tmp_path / "bad_field.bxa").write_bytes(bad_field)
+    (tmp_path / "truncated.bxa").write_bytes(data[:-1])
+    receipt = paths[1].read_bytes()
+    not_object = b'["' + b"x" * (len(receipt) - 4) + b'"]'
+    assert zlib.compress(receipt, 0) in data
+    (tmp_path / "not_object.bxa").write_bytes(data.replace(zlib.compress(receipt, 0), zlib.compress(not_object, 0)))
+
+    report = verify_document_hashes(
+        [tmp_path / "bad_field.bxa", tmp_path / "truncated.bxa", tmp_path / "not_object.bxa"], workers=1
+    )
+
+    assert [(result["path"].rsplit("/", 1)[1], result["ok"], result["error"]) for result in report["documents"]] == [
+        ("bad_field.bxa#0", False, f"record 0 of {tmp_path / 'bad_field.bxa'} is corrupt"),
+        ("bad_field.bxa#receipt.json", True, None),
+        ("bad_field.bxa#replay_report.json", True, None),
+        ("truncated.bxa", False, f"{tmp_path / 'truncated.bxa'} is truncated"),
+        ("not_object.bxa#snapshot.json", True, None),
+        ("not_object.bxa#receipt.json", False, None),
+        ("not_object.bxa#replay_report.json", True, None),
+    ]
+
+
+def test_verify_hashes_splits_archives_by_block_range(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    paths = _write_documents(tmp_path)
+    archive = tmp_path / "history.bxa"
+    pack_archive(paths, archive, block_size=1)
+
+    serial = verify_document_hashes([archive], workers=1)
+    parallel = verify_document_hashes([archive], workers=2)
+
+    assert parallel["documents"] == serial["documents"]
+    assert len(parallel["documents"]) == len(paths)
+    assert parallel["throughput"]["workers"] == 2
+    assert parallel["summary"]["ok"] is True
+
+
+def test_verify_hashes_fails_without_documents(tmp_path: Path, capsys) -> None:
+    report = verify_document_hashes([])
+    assert report["summary"]["ok"] is False
+    assert report["summary"]["total_documents"] == 0
+
+    with pytest.raises(SystemExit) as excinfo:
+        main(["verify-hashes", "--files", str(tmp_path / "nomatch" / "**")])
+    assert excinfo.value.code == 2
+    assert "no files match" in capsys.readouterr().err
+
+
+def test_verify_hashes_reports_unreadable_compressed_documents(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("BLUX_DETERMINISTIC_TIMESTAMP", "2024-01-01T00:00:00Z")
+    receipt = _write_documents(tmp_path)[1]
+    truncated = tmp_path / "truncated.json.gz"
+    truncated.write_bytes(gzip.compress(receipt.read_bytes())[:-12])
+    zstd = tmp_path / "receipt.json.zst"
+    zstd.write_bytes(b"\x28\xb5\x2f\xfd" + b"\x00" * 16)
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+
+    report = verify_document_hashes([truncated, zstd, receipt], workers=1)
+
+    assert [(result["ok"], result["error"] is not None) for result in report["documents"]] == [
+        (False, True),
+        (False, True),
+        (True, False),
+    ]
+    assert "not a valid gzip stream" in report["documents"][0]["error"]
+    assert "requires the 'zstandard' package" in report["documents"][1]["error"]